@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+HTTP load driver for the tourist routes application.
+Usage: python bench_concurrency.py --url http://localhost:8000 [--concurrency 100] [--requests 2000]
+       [--path '/routes/search/?q=Маршрут {n}'] [--path /routes/]
+       [--gunicorn [--gunicorn-workers 4]] [--output results.json [--label before]]
+
+Every client thread sends requests in a loop until the total is reached.
+`{n}` in a path is replaced with the request number (e.g. to bypass the
+search cache). AJAX endpoints get the X-Requested-With header.
+Prints throughput and latency percentiles.
+
+With --gunicorn a local gunicorn is started on the port of --url for the
+duration of the run. With --output the results are written as JSON (a
+list per label), so runs before and after a change can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tourist_routes')
+DEFAULT_PATHS = ['/routes/search/?q=Маршрут {n}', '/routes/']
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def build_url(base_url, path, number):
+    path = path.replace('{n}', str(number))
+    # Keep '/', '?', '=' and '&' as they are, escape the rest (Cyrillic, spaces)
+    return base_url.rstrip('/') + urllib.parse.quote(path, safe='/?=&')
+
+
+def run(base_url, paths, concurrency, total_requests, timeout):
+    """Send total_requests requests from `concurrency` threads; returns the results"""
+    counter = iter(range(total_requests))
+    lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+
+    def client():
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            path = paths[number % len(paths)]
+            request = urllib.request.Request(build_url(base_url, path, number))
+            if '/search/' in path:
+                request.add_header('X-Requested-With', 'XMLHttpRequest')
+
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'url': base_url,
+        'paths': paths,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'ok': statuses[200],
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'seconds': wall,
+        'requests_per_second': len(latencies) / wall if wall else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def print_results(results):
+    print(f"{results['requests']} requests, {results['concurrency']} concurrent clients, "
+          f"{results['seconds']:.2f}s")
+    print(f"  throughput: {results['requests_per_second']:.1f} req/s")
+    print(f"  latency: p50 {results['p50'] * 1000:.0f} ms, p95 {results['p95'] * 1000:.0f} ms, "
+          f"p99 {results['p99'] * 1000:.0f} ms, max {results['max'] * 1000:.0f} ms")
+    print(f"  statuses: {results['statuses']}")
+
+
+def start_gunicorn(base_url, workers, app, timeout=30):
+    """Start gunicorn for the application on the port of base_url and wait until it accepts connections"""
+    parsed = urllib.parse.urlsplit(base_url)
+    host, port = parsed.hostname or 'localhost', parsed.port or 80
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', app, '--bind', f'{host}:{port}', '--workers', str(workers)],
+        cwd=PROJECT_DIR,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not start listening on {host}:{port} in {timeout}s')
+
+
+def save_results(path, label, results):
+    """Append a labelled run to the JSON results file"""
+    runs = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            runs = json.load(f)
+    runs.append({
+        'label': label,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        **results,
+    })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent HTTP benchmark for tourist routes')
+    parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the application')
+    parser.add_argument('--concurrency', type=int, default=100, help='Number of client threads')
+    parser.add_argument('--requests', type=int, default=2000, help='Total number of requests')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Request path (repeatable, used round-robin); {n} is the request number')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout, seconds')
+    parser.add_argument('--gunicorn', action='store_true', help='Start a local gunicorn on the --url port')
+    parser.add_argument('--gunicorn-workers', type=int, default=4, help='Workers of the local gunicorn')
+    parser.add_argument('--gunicorn-app', default='tourist_routes.wsgi:application',
+                        help='Application module of the local gunicorn')
+    parser.add_argument('--output', help='JSON file to append the results to')
+    parser.add_argument('--label', default='', help='Label of this run in the JSON file (e.g. a commit)')
+    args = parser.parse_args()
+
+    server = start_gunicorn(args.url, args.gunicorn_workers, args.gunicorn_app) if args.gunicorn else None
+    try:
+        results = run(args.url, args.paths or DEFAULT_PATHS, args.concurrency, args.requests, args.timeout)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print_results(results)
+    if args.output:
+        save_results(args.output, args.label, results)
+        print(f"✓ Results appended to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
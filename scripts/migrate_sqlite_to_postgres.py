@@ -1,33 +1,63 @@
 #!/usr/bin/env python
 """
 Script to migrate data from SQLite to PostgreSQL.
-Usage: python migrate_sqlite_to_postgres.py --source sqlite_db_path
+Usage: python migrate_sqlite_to_postgres.py --source sqlite_db_path [--workers N]
+       [--chunk-size N] [--batch-size N] [--checkpoint path] [--truncate]
+
+The SQLite file is opened as a second Django database alias. The routes id
+range is split into chunks that a pool of worker processes (each with its
+own PostgreSQL connection) copies with COPY FROM STDIN, one transaction per
+chunk. Finished chunks are recorded in a checkpoint file, so running the
+script again after a crash resumes the copy. Afterwards sequences are reset
+and row counts and checksums of both databases are compared.
 """
 
 import os
 import sys
+import io
+import json
+import time
+import hashlib
+import contextlib
+import multiprocessing
 import django
 from pathlib import Path
 import argparse
 from datetime import datetime
 
-# Set up Django
+# Make `tourist_routes` importable when the script is run from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tourist_routes'))
+
+# Set up Django (django.setup() is called in main() after the source alias is registered)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tourist_routes.settings')
-django.setup()
 
-from django.core.management import call_command
-from django.db import connections
-from routes_app.models import TouristRoute
+SOURCE_ALIAS = 'sqlite_source'
+TABLE = 'routes_app_touristroute'
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def register_source_database(sqlite_path):
+    """Add the SQLite file as a read-only second database alias"""
+    from django.conf import settings
+
+    settings.DATABASES[SOURCE_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(sqlite_path),
+    }
 
 
 def backup_current_db(db_alias='default'):
     """Create a backup of current database"""
+    from django.db import connections
+
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     print(f"Creating backup... [{timestamp}]")
-    
+
     connection = connections[db_alias]
     db_name = connection.settings_dict.get('NAME')
-    
+
     if isinstance(db_name, Path):
         backup_path = f"{db_name}.backup.{timestamp}"
         import shutil
@@ -36,75 +66,331 @@ def backup_current_db(db_alias='default'):
     print()
 
 
-def migrate_data():
-    """Migrate data from old database to new database"""
+def copy_columns(source_connection):
+    """Model columns that exist in the source table (older SQLite schemas may lack some)"""
+    from routes_app.models import TouristRoute
+
+    with source_connection.cursor() as cursor:
+        source_columns = {
+            column.name for column in
+            source_connection.introspection.get_table_description(cursor, TABLE)
+        }
+    # search_vector is maintained by a PostgreSQL trigger, never copied
+    return [
+        field.column for field in TouristRoute._meta.concrete_fields
+        if field.column in source_columns and field.column != 'search_vector'
+    ]
+
+
+def _copy_value(value):
+    """Encode one value for COPY text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_batch(target_cursor, columns, rows):
+    """Load one batch of rows into PostgreSQL with COPY FROM STDIN"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f'COPY {TABLE} ({", ".join(columns)}) FROM STDIN'
+    raw_cursor = target_cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        # psycopg2
+        raw_cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def reset_sequences(db_alias='default'):
+    """Move the id sequence past the copied ids"""
+    from django.core.management.color import no_style
+    from django.db import connections
+    from routes_app.models import TouristRoute
+
+    connection = connections[db_alias]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [TouristRoute]):
+            cursor.execute(sql)
+
+
+def table_checksum(db_alias, columns):
+    """Row count and SHA-256 over all rows ordered by id (values normalized by the ORM)"""
+    from routes_app.models import TouristRoute
+
+    fields = [TouristRoute._meta.get_field(column).name for column in columns
+              if column != 'id']
+    digest = hashlib.sha256()
+    count = 0
+    rows = (TouristRoute.objects.using(db_alias).order_by('id')
+            .values_list('id', *fields).iterator(chunk_size=DEFAULT_BATCH_SIZE))
+    for row in rows:
+        digest.update(repr(tuple(
+            value.isoformat() if hasattr(value, 'isoformat') else value for value in row
+        )).encode('utf-8'))
+        count += 1
+    return count, digest.hexdigest()
+
+
+def _source_fingerprint(sqlite_path):
+    """Identifies the source file and the target database of a run"""
+    from django.db import connections
+
+    stat = os.stat(sqlite_path)
+    target = connections['default'].settings_dict
+    return {
+        'source': os.path.abspath(sqlite_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'target': f"{target.get('HOST')}:{target.get('PORT')}/{target.get('NAME')}",
+    }
+
+
+def load_checkpoint(path, fingerprint, chunk_size):
+    """Chunks committed by a previous run as {first id: rows}, or None if there is no checkpoint"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('fingerprint') != fingerprint or data.get('chunk_size') != chunk_size:
+        raise RuntimeError(
+            f'checkpoint {path} belongs to another source, target or chunk size; '
+            'use --truncate to start over'
+        )
+    return {int(start): rows for start, rows in data['done'].items()}
+
+
+def save_checkpoint(path, fingerprint, chunk_size, done):
+    """Atomically rewrite the checkpoint file"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'chunk_size': chunk_size,
+                   'done': {str(start): rows for start, rows in done.items()}}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _init_worker(sqlite_path):
+    """Pool initializer: each worker opens its own database connections"""
+    from django.apps import apps
+
+    # With fork Django is already set up; spawn/forkserver start from scratch
+    if not apps.ready:
+        register_source_database(sqlite_path)
+        django.setup()
+
+
+def copy_chunk(task):
+    """Copy routes with start <= id < end in one transaction
+
+    The range is deleted first, so a chunk that was committed but not yet
+    recorded in the checkpoint can safely be copied again.
+    """
+    from django.db import connections, transaction
+
+    start, end, columns, batch_size = task
+    started = time.perf_counter()
+    copied = 0
+    with transaction.atomic():
+        with connections['default'].cursor() as target_cursor:
+            target_cursor.execute(f'DELETE FROM {TABLE} WHERE id >= %s AND id < %s', [start, end])
+            with connections[SOURCE_ALIAS].cursor() as source_cursor:
+                source_cursor.execute(
+                    f'SELECT {", ".join(columns)} FROM {TABLE} WHERE id >= %s AND id < %s ORDER BY id',
+                    [start, end]
+                )
+                while True:
+                    rows = source_cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    copy_batch(target_cursor, columns, rows)
+                    copied += len(rows)
+    return {
+        'start': start,
+        'end': end,
+        'rows': copied,
+        'seconds': time.perf_counter() - started,
+        'worker': os.getpid(),
+    }
+
+
+def migrate_data(sqlite_path, batch_size=DEFAULT_BATCH_SIZE, truncate=False,
+                 workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None):
+    """Copy routes from the SQLite source alias into the default PostgreSQL database
+
+    The id range is split into chunks of chunk_size ids, copied by a pool of
+    worker processes (one transaction per chunk). Finished chunks are written
+    to the checkpoint file, so an interrupted run resumes where it stopped.
+    """
+    from django.core.management import call_command
+    from django.db import connections
+    from routes_app.caching import bump_data_version
+    from routes_app.statistics import rebuild_route_statistics
+
     print("=" * 70)
     print("TOURIST ROUTES - DATA MIGRATION TOOL")
     print("=" * 70)
     print()
-    
+
+    checkpoint_path = checkpoint_path or f'{sqlite_path}.checkpoint.json'
+
     try:
         # Check current database configuration
         connection = connections['default']
+        source = connections[SOURCE_ALIAS]
         db_engine = connection.settings_dict.get('ENGINE', '')
         db_name = connection.settings_dict.get('NAME', '')
-        
-        print(f"Current Database Configuration:")
+
+        print(f"Source: {source.settings_dict['NAME']}")
+        print(f"Target Database Configuration:")
         print(f"  Engine: {db_engine}")
         print(f"  Name: {db_name}")
         print()
-        
-        # Get existing routes
-        existing_routes = TouristRoute.objects.all()
-        print(f"Found {existing_routes.count()} existing routes in database")
-        
-        if existing_routes.count() > 0:
-            print("\nExisting routes:")
-            for route in existing_routes:
-                print(f"  - {route.name} ({route.region})")
-        print()
-        
+
+        if connection.vendor != 'postgresql':
+            raise RuntimeError('the target (default) database must be PostgreSQL')
+
         # Run migrations to ensure schema is up to date
         print("Running Django migrations...")
         call_command('migrate', verbosity=0, interactive=False)
         print("✓ Migrations completed")
         print()
-        
+
+        fingerprint = _source_fingerprint(sqlite_path)
+        if truncate:
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {TABLE} RESTART IDENTITY')
+            done = {}
+        else:
+            done = load_checkpoint(checkpoint_path, fingerprint, chunk_size)
+            if done is None:
+                done = {}
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+                    existing = cursor.fetchone()[0]
+                if existing:
+                    raise RuntimeError(
+                        f'target table already has {existing} routes; use --truncate to replace them'
+                    )
+            else:
+                print(f"Resuming from {checkpoint_path}: {len(done)} chunks, "
+                      f"{sum(done.values())} rows already copied")
+
+        columns = copy_columns(source)
+        with source.cursor() as cursor:
+            cursor.execute(f'SELECT MIN(id), MAX(id), COUNT(*) FROM {TABLE}')
+            min_id, max_id, source_total = cursor.fetchone()
+        print(f"Found {source_total} routes in SQLite, copying columns: {', '.join(columns)}")
+
+        tasks = []
+        if source_total:
+            tasks = [
+                (start, min(start + chunk_size, max_id + 1), columns, batch_size)
+                for start in range(min_id, max_id + 1, chunk_size)
+                if start not in done
+            ]
+        chunks_total = len(done) + len(tasks)
+        print(f"Copying {len(tasks)} of {chunks_total} chunks with {workers} worker(s)")
+        save_checkpoint(checkpoint_path, fingerprint, chunk_size, done)
+
+        started = time.perf_counter()
+        worker_stats = {}
+        copied = 0
+        if workers > 1:
+            # Workers must not share the parent's connections
+            connections.close_all()
+            pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(sqlite_path,))
+        else:
+            pool = contextlib.nullcontext()
+        with pool:
+            results = pool.imap_unordered(copy_chunk, tasks) if workers > 1 else map(copy_chunk, tasks)
+            for result in results:
+                done[result['start']] = result['rows']
+                save_checkpoint(checkpoint_path, fingerprint, chunk_size, done)
+
+                stats = worker_stats.setdefault(result['worker'], {'chunks': 0, 'rows': 0, 'seconds': 0.0})
+                stats['chunks'] += 1
+                stats['rows'] += result['rows']
+                stats['seconds'] += result['seconds']
+                copied += result['rows']
+                rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+                print(f"  [{len(done)}/{chunks_total}] ids {result['start']}-{result['end'] - 1}: "
+                      f"{result['rows']} rows, worker {result['worker']}, {rate:.0f} rows/s")
+
+        reset_sequences()
+        # COPY fires no signals: rebuild the statistics table and invalidate
+        # cached pages and search results explicitly
+        groups = rebuild_route_statistics()
+        print(f"✓ Route statistics rebuilt: {groups} groups")
+        bump_data_version()
+        elapsed = time.perf_counter() - started
+        print(f"✓ Copied {copied} rows in {elapsed:.2f}s")
+        print()
+
+        print("Benchmark summary:")
+        for worker, stats in sorted(worker_stats.items()):
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            print(f"  worker {worker}: {stats['chunks']} chunks, {stats['rows']} rows "
+                  f"in {stats['seconds']:.2f}s ({rate:.0f} rows/s)")
+        print(f"  total: {copied} rows in {elapsed:.2f}s wall "
+              f"({copied / elapsed if elapsed else 0:.0f} rows/s, {workers} worker(s), "
+              f"{len(tasks)} chunks of {chunk_size} ids)")
+        print()
+
         # Verify migration
         print("Verifying migration...")
-        final_count = TouristRoute.objects.all().count()
-        print(f"✓ Total routes in new database: {final_count}")
+        source_count, source_checksum = table_checksum(SOURCE_ALIAS, columns)
+        target_count, target_checksum = table_checksum('default', columns)
+        print(f"  SQLite:     {source_count} rows, sha256 {source_checksum}")
+        print(f"  PostgreSQL: {target_count} rows, sha256 {target_checksum}")
+        if (source_count, source_checksum) != (target_count, target_checksum):
+            raise RuntimeError('row counts or checksums differ')
+        os.remove(checkpoint_path)
+        print(f"✓ Total routes in new database: {target_count}")
         print()
-        
+
         print("=" * 70)
         print("MIGRATION COMPLETED SUCCESSFULLY!")
         print("=" * 70)
-        
+
     except Exception as e:
         print(f"✗ Migration error: {str(e)}")
+        if os.path.exists(checkpoint_path):
+            print(f"  Progress is saved in {checkpoint_path}; run again to resume")
         sys.exit(1)
 
 
-def export_sqlite_to_json(sqlite_path):
+def export_sqlite_to_json(db_alias=SOURCE_ALIAS):
     """Export data from SQLite database to JSON for inspection"""
-    print(f"Exporting data from SQLite: {sqlite_path}")
-    
+    from routes_app.models import TouristRoute
+
+    print(f"Exporting data from SQLite alias: {db_alias}")
+
     try:
         import json
         from django.core.serializers import serialize
-        from django.db import connections
-        
+
         # Get all routes
-        routes = TouristRoute.objects.all()
+        routes = TouristRoute.objects.using(db_alias).all()
         routes_data = json.loads(serialize('json', routes))
-        
+
         output_file = 'routes_export.json'
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(routes_data, f, ensure_ascii=False, indent=2)
-        
+
         print(f"✓ Data exported to {output_file}")
         return output_file
-        
+
     except Exception as e:
         print(f"✗ Export error: {str(e)}")
         return None
@@ -114,6 +400,38 @@ def main():
     parser = argparse.ArgumentParser(
         description='Migrate tourist routes data from SQLite to PostgreSQL'
     )
+    parser.add_argument(
+        '--source',
+        required=True,
+        help='Path to the SQLite database file to copy from'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help='Rows per COPY batch'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Number of copying worker processes (default: CPU count)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help='Ids per chunk (one transaction and checkpoint entry each)'
+    )
+    parser.add_argument(
+        '--checkpoint',
+        help='Checkpoint file (default: <source>.checkpoint.json)'
+    )
+    parser.add_argument(
+        '--truncate',
+        action='store_true',
+        help='Empty the PostgreSQL table and drop the checkpoint before copying'
+    )
     parser.add_argument(
         '--backup',
         action='store_true',
@@ -124,16 +442,23 @@ def main():
         action='store_true',
         help='Export SQLite data to JSON before migration'
     )
-    
+
     args = parser.parse_args()
-    
+
+    if not os.path.exists(args.source):
+        parser.error(f'SQLite file not found: {args.source}')
+    register_source_database(args.source)
+    django.setup()
+
     if args.backup:
         backup_current_db()
-    
+
     if args.export:
-        export_sqlite_to_json('')
-    
-    migrate_data()
+        export_sqlite_to_json()
+
+    migrate_data(args.source, batch_size=args.batch_size, truncate=args.truncate,
+                 workers=max(1, args.workers), chunk_size=args.chunk_size,
+                 checkpoint_path=args.checkpoint)
 
 
 if __name__ == '__main__':
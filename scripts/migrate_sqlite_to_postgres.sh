@@ -25,6 +25,7 @@ docker compose run --rm \
   python manage.py dumpdata \
     --natural-foreign --natural-primary \
     --exclude contenttypes --exclude auth.permission \
+    --exclude routes_app.RouteStatistic \
     --indent 2 \
   > "$FIXTURE_PATH"
 
@@ -34,4 +35,7 @@ docker compose run --rm web python manage.py migrate --noinput
 echo "[3/3] Importing data into PostgreSQL from fixture"
 docker compose run --rm web python manage.py loaddata /app/scripts/sqlite_dump.json
 
+# loaddata saves routes with raw=True, which skips the statistics signals
+docker compose run --rm web python manage.py rebuild_route_statistics
+
 echo "✓ Done. PostgreSQL is now filled with data from SQLite."
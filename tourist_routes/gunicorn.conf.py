@@ -0,0 +1,69 @@
+# Gunicorn configuration (picked up automatically from the working directory,
+# /app/tourist_routes in the Docker image, or explicitly: gunicorn -c gunicorn.conf.py)
+import gc
+import os
+
+wsgi_app = os.getenv('GUNICORN_APP', 'tourist_routes.wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+# Sync workers are killed after `timeout` seconds without finishing a request.
+# Uploads up to nginx's client_max_body_size (512M) with import into the DB
+# run for minutes (~36 s for 100k routes), so the 30 s default is too short.
+# Keep nginx proxy_read_timeout at least as long.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '600'))
+
+# The application is imported and warmed up once in the master; forked workers
+# share the warmed memory (views, compiled templates, XML routes, search index)
+# copy-on-write instead of building it on their first requests.
+# Note: with preload, code changes require a full restart, not a HUP.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+WARMUP = os.getenv('GUNICORN_WARMUP', 'True') == 'True'
+
+
+def on_starting(server):
+    """Runs in the master before workers are started: drops metrics of a previous run."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tourist_routes.settings')
+    from routes_app.metrics import clear_metrics_dir
+
+    clear_metrics_dir()
+
+
+def child_exit(server, worker):
+    """Runs in the master after a worker exits: folds its metrics file into metrics-exited.json."""
+    from routes_app.metrics import retire_process_metrics
+
+    try:
+        retire_process_metrics(worker.pid)
+    except OSError:
+        server.log.exception('Failed to retire metrics of worker %s', worker.pid)
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before workers are forked."""
+    if not (preload_app and WARMUP):
+        return
+    from routes_app.warmup import release_connections, warm_up
+
+    try:
+        steps = warm_up()
+    except Exception:
+        # Workers start cold and warm up on the first readiness probe
+        server.log.exception('Warm-up failed')
+    else:
+        server.log.info('Warm-up done: %s', ', '.join(
+            f'{name}={result} ({seconds:.2f}s)' for name, (result, seconds) in steps.items()))
+    finally:
+        # Sockets inherited by several processes would corrupt the protocol
+        release_connections()
+    # Move warmed objects out of the GC generations, so collections in the
+    # workers don't write to (and un-share) their pages
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from routes_app.warmup import release_connections
+
+        release_connections()
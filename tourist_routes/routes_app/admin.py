@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import TouristRoute
+from .models import RouteStatistic, TouristRoute
 
-admin.site.register(TouristRoute)
\ No newline at end of file
+admin.site.register(TouristRoute)
+admin.site.register(RouteStatistic)
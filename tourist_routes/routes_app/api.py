@@ -0,0 +1,114 @@
+import hashlib
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_safe
+from .caching import SEARCH_CACHE_TIMEOUT, get_data_changed_at, get_data_version
+from .pagination import ROUTES_PER_PAGE, keyset_page
+from .search import db_routes
+
+API_FIELDS = ('id', 'name', 'description', 'length_km', 'duration_days', 'difficulty',
+              'region', 'best_season', 'kolvo_chel', 'created_at')
+API_DEFAULT_FIELDS = ('id', 'name', 'length_km', 'duration_days', 'difficulty',
+                      'region', 'best_season', 'kolvo_chel', 'created_at')
+API_MAX_LIMIT = 200
+API_FILTERS = ('search', 'region', 'difficulty')
+API_STATE_PREFIX = 'api_routes:state'
+
+
+class ApiError(ValueError):
+    pass
+
+
+def _parse_fields(value):
+    """Поля из параметра fields=name,region; описание - только по запросу"""
+    if not value:
+        return API_DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown or not fields:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}; доступны: {", ".join(API_FIELDS)}')
+    return fields
+
+
+def _parse_limit(value):
+    try:
+        limit = int(value) if value else ROUTES_PER_PAGE
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def _filtered_routes(request):
+    routes = db_routes(request.GET.get('search', ''))
+    if request.GET.get('region'):
+        routes = routes.filter(region=request.GET['region'])
+    if request.GET.get('difficulty'):
+        routes = routes.filter(difficulty=request.GET['difficulty'])
+    return routes
+
+
+def _routes_state(request):
+    """(версия данных, число маршрутов, max created_at) для выборки запроса
+
+    Считается одним агрегатом и кэшируется до следующего изменения данных;
+    на запрос вычисляется один раз (его используют и ETag, и Last-Modified).
+    """
+    if not hasattr(request, '_api_routes_state'):
+        version = get_data_version()
+        # urlencode экранирует & и = в значениях: разные фильтры не дают одну строку
+        filters = urlencode(sorted((key, request.GET.get(key, '')) for key in API_FILTERS))
+        key = f'{API_STATE_PREFIX}:{version}:{hashlib.md5(filters.encode("utf-8")).hexdigest()}'
+        state = cache.get(key)
+        if state is None:
+            aggregate = _filtered_routes(request).aggregate(
+                count=models.Count('id'), last_created=models.Max('created_at')
+            )
+            state = (aggregate['count'], aggregate['last_created'])
+            cache.set(key, state, SEARCH_CACHE_TIMEOUT)
+        request._api_routes_state = (version,) + state
+    return request._api_routes_state
+
+
+def _routes_etag(request):
+    version, count, last_created = _routes_state(request)
+    last_created = last_created.timestamp() if last_created else 0
+    digest = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()[:12]
+    return f'{version}-{count}-{last_created}-{digest}'
+
+
+def _routes_last_modified(request):
+    # created_at не меняется при редактировании - учитываем время последнего изменения
+    _, _, last_created = _routes_state(request)
+    changed_at = get_data_changed_at()
+    return max(last_created, changed_at) if last_created else changed_at
+
+
+@require_safe
+@transaction.non_atomic_requests
+@condition(etag_func=_routes_etag, last_modified_func=_routes_last_modified)
+def routes_api(request):
+    """JSON API маршрутов из БД
+
+    Параметры: fields (список полей через запятую), search, region,
+    difficulty, limit и cursor (постраничный вывод как в routes_list).
+    Из БД читаются только запрошенные поля; неизмененная выборка отдается
+    ответом 304 по If-None-Match / If-Modified-Since.
+    """
+    try:
+        fields = _parse_fields(request.GET.get('fields'))
+        limit = _parse_limit(request.GET.get('limit'))
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # id и created_at нужны для курсора
+    routes = _filtered_routes(request).only(*fields, 'id', 'created_at')
+    routes, next_cursor = keyset_page(routes, request.GET.get('cursor'), per_page=limit)
+
+    return JsonResponse({
+        'results': [{field: getattr(route, field) for field in fields} for route in routes],
+        'count': len(routes),
+        'next_cursor': next_cursor,
+    }, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class RoutesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'routes_app'
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .metrics import install_db_wrapper
+
+        # Замер SQL запросов для PerformanceMiddleware
+        connection_created.connect(install_db_wrapper)
+        for connection in connections.all(initialized_only=True):
+            install_db_wrapper(connection)
@@ -0,0 +1,124 @@
+"""Асинхронные (ASGI) варианты читающих представлений
+
+Подключаются в urls.py вместо views.routes_list, views.ajax_search и
+views.download_xml при ASYNC_VIEWS=True. Запросы к БД идут через async ORM,
+работа с XML файлом - в пуле потоков, поэтому медленный поиск не занимает
+воркер целиком.
+"""
+import asyncio
+import os
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.csrf import csrf_exempt
+from .caching import (
+    cache_routes_page, cache_search, get_cached_routes_page, get_cached_search,
+    normalize_search_query, search_cache_key,
+)
+from .pagination import akeyset_page
+from .search import db_routes, search_routes
+from .views import (
+    _routes_table_key, _search_result, _xml_download_disposition, _xml_routes_page,
+)
+from .xml_store import xml_file_path
+
+XML_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def _routes_table_context(source, search_query, cursor):
+    context = {
+        'source': source,
+        'search_query': search_query,
+        'cursor': cursor,
+    }
+    if source == 'xml':
+        # Разбор XML файла и поиск по индексу - в отдельном потоке
+        context['xml_routes'], context['next_cursor'] = await asyncio.to_thread(
+            _xml_routes_page, search_query, cursor
+        )
+    else:
+        context['routes'], context['next_cursor'] = await akeyset_page(
+            db_routes(search_query), cursor
+        )
+    return context
+
+# ATOMIC_REQUESTS не поддерживается для async представлений,
+# а транзакция читающим запросам и не нужна
+@transaction.non_atomic_requests
+async def routes_list(request):
+    source = request.GET.get('source', 'db')
+    search_query = request.GET.get('search', '')
+    cursor = request.GET.get('cursor', '')
+
+    cache_key = await sync_to_async(_routes_table_key)(source, search_query, cursor)
+    routes_table = await sync_to_async(get_cached_routes_page)(cache_key)
+    if routes_table is None:
+        context = await _routes_table_context(source, search_query, cursor)
+        routes_table = render_to_string('routes_app/routes_table.html', context)
+        await sync_to_async(cache_routes_page)(cache_key, routes_table)
+
+    context = {
+        'source': source,
+        'search_query': search_query,
+        'routes_table': routes_table,
+    }
+    # Шаблон обращается к сессии (сообщения), поэтому рендерится синхронно
+    return await sync_to_async(render)(request, 'routes_app/routes_list.html', context)
+
+@csrf_exempt
+@transaction.non_atomic_requests
+async def ajax_search(request):
+    """AJAX поиск по маршрутам из БД"""
+    if request.method == 'GET' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        query = request.GET.get('q', '').strip()
+
+        if len(query) < 2:
+            return JsonResponse({'results': [], 'message': 'Введите минимум 2 символа'})
+
+        try:
+            search_query = normalize_search_query(query)
+            cache_key = await sync_to_async(search_cache_key)(search_query)
+            payload = await sync_to_async(get_cached_search)(cache_key)
+            if payload is None:
+                results = [_search_result(route) async for route in search_routes(search_query)]
+
+                payload = {'results': results, 'count': len(results)}
+                await sync_to_async(cache_search)(cache_key, payload)
+
+            return JsonResponse({**payload, 'query': query})
+
+        except Exception as e:
+            return JsonResponse({'results': [], 'error': str(e)})
+
+    return JsonResponse({'results': [], 'error': 'Invalid request'})
+
+async def _read_file_chunks(xml_file, chunk_size=XML_DOWNLOAD_CHUNK_SIZE):
+    """Читает открытый файл блоками в пуле потоков, не блокируя цикл событий"""
+    try:
+        while True:
+            chunk = await asyncio.to_thread(xml_file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(xml_file.close)
+
+@transaction.non_atomic_requests
+async def download_xml(request):
+    """Скачивание XML файла"""
+    try:
+        xml_file = await asyncio.to_thread(open, xml_file_path(), 'rb')
+    except OSError:
+        messages.error(request, 'XML файл не существует')
+        return redirect('routes_list')
+
+    # Размер берется у уже открытого файла: запись подменяет файл через
+    # os.replace, а открытый дескриптор читает прежнюю версию до конца
+    size = os.fstat(xml_file.fileno()).st_size
+    response = StreamingHttpResponse(_read_file_chunks(xml_file), content_type='application/xml')
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = _xml_download_disposition()
+    return response
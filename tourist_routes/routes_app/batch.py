@@ -0,0 +1,205 @@
+from decimal import InvalidOperation
+from django.db import transaction
+from .caching import bump_data_version
+from .importer import _build_route
+from .models import TouristRoute
+from .statistics import apply_route_changes, route_values
+from .validators import validate_route_data, validate_route_fields
+
+BATCH_PREFIX = 'routes'
+BATCH_MAX_ROUTES = 500
+BATCH_FIELDS = ('name', 'description', 'length_km', 'duration_days', 'difficulty',
+                'region', 'best_season', 'kolvo_chel')
+# Поля, обновляемые пакетным редактированием
+_UPDATE_FIELDS = BATCH_FIELDS
+
+# Строка без этих полей считается пустой (сложность выбрана по умолчанию)
+_CONTENT_FIELDS = tuple(field for field in BATCH_FIELDS if field != 'difficulty')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_batch_rows(data, prefix=BATCH_PREFIX):
+    """Маршруты из полей формы вида routes-TOTAL_FORMS и routes-N-поле
+
+    Полностью пустые строки пропускаются; у строк редактирования есть
+    поле id.
+    """
+    try:
+        total = int(data.get(f'{prefix}-TOTAL_FORMS', 0))
+    except ValueError:
+        raise BatchError('Некорректное число строк формы')
+    if total > BATCH_MAX_ROUTES:
+        raise BatchError(f'Не больше {BATCH_MAX_ROUTES} маршрутов за раз')
+
+    rows = []
+    for i in range(total):
+        row = {field: data.get(f'{prefix}-{i}-{field}', '').strip() for field in BATCH_FIELDS}
+        route_id = data.get(f'{prefix}-{i}-id', '').strip()
+        if route_id:
+            row['id'] = route_id
+        if route_id or any(row[field] for field in _CONTENT_FIELDS):
+            rows.append(row)
+    return rows
+
+
+def _route_key(route):
+    return (route.name, route.region, route.length_km)
+
+
+def _existing_keys(routes):
+    """{(name, region, length_km): id} для маршрутов БД с теми же названиями"""
+    names = {route.name for route in routes}
+    if not names:
+        return {}
+    existing = TouristRoute.objects.filter(name__in=names).values_list('name', 'region', 'length_km', 'id')
+    return {(name, region, length_km): route_id for name, region, length_km, route_id in existing}
+
+
+def _check_row(index, row):
+    """Результат строки и построенный маршрут (None, если данные некорректны)"""
+    result = {'index': index, 'data': row, 'status': 'invalid', 'errors': validate_route_data(row)}
+    if result['errors']:
+        return result, None
+    try:
+        route = _build_route(row)
+    except (InvalidOperation, ValueError):
+        result['errors'] = ['Число вне допустимого диапазона']
+        return result, None
+    result['errors'] = validate_route_fields(route)
+    if result['errors']:
+        return result, None
+    return result, route
+
+
+def _inserted_ids(routes):
+    """{(name, region, length_km): id} маршрутов, действительно вставленных bulk_create
+
+    bulk_create(ignore_conflicts=True) молча пропускает конфликтующие строки
+    и не заполняет id. Строка, добавленная параллельным запросом, есть в БД
+    с тем же ключом, но с другим created_at.
+    """
+    created_at = {_route_key(route): route.created_at for route in routes}
+    rows = (TouristRoute.objects.filter(name__in={route.name for route in routes})
+            .values_list('name', 'region', 'length_km', 'created_at', 'id'))
+    return {(name, region, length_km): route_id
+            for name, region, length_km, created, route_id in rows
+            if created_at.get((name, region, length_km)) == created}
+
+
+def _mark_duplicate(result, in_batch):
+    result['status'] = 'duplicate'
+    result['errors'] = ['Маршрут повторяется в этом пакете' if in_batch
+                        else 'Маршрут с таким названием, регионом и протяженностью уже существует']
+
+
+def add_routes(rows):
+    """Добавляет маршруты одной транзакцией через bulk_create
+
+    Каждая строка проверяется validate_route_data; дубликаты (по уникальному
+    ключу name, region, length_km - в БД или внутри пакета) не прерывают
+    пакет, а отмечаются в результате строки. Возвращает список результатов
+    со статусами created / duplicate / invalid.
+    """
+    results = []
+    candidates = []
+    for index, row in enumerate(rows):
+        result, route = _check_row(index, row)
+        results.append(result)
+        if route is not None:
+            candidates.append((result, route))
+
+    existing = _existing_keys([route for _, route in candidates])
+    seen = set()
+    new_routes = []
+    for result, route in candidates:
+        key = _route_key(route)
+        if key in existing or key in seen:
+            _mark_duplicate(result, key in seen)
+            continue
+        seen.add(key)
+        new_routes.append((result, route))
+
+    if new_routes:
+        with transaction.atomic():
+            # ignore_conflicts - на случай параллельного добавления того же маршрута
+            TouristRoute.objects.bulk_create([route for _, route in new_routes], ignore_conflicts=True)
+            inserted = _inserted_ids([route for _, route in new_routes])
+            created = []
+            for result, route in new_routes:
+                route.id = inserted.get(_route_key(route))
+                if route.id is None:
+                    _mark_duplicate(result, False)
+                    continue
+                result['status'] = 'created'
+                created.append(route)
+            if created:
+                # bulk_create не отправляет сигналы - сводка и версия данных обновляются явно
+                apply_route_changes((route_values(route), 1) for route in created)
+                transaction.on_commit(bump_data_version)
+    return results
+
+
+def update_routes(rows):
+    """Обновляет маршруты БД одной транзакцией через bulk_update
+
+    Строки ссылаются на маршрут полем id. Возвращает результаты со
+    статусами updated / duplicate / invalid / not_found.
+    """
+    ids = []
+    for row in rows:
+        try:
+            ids.append(int(row.get('id', '')))
+        except ValueError:
+            pass
+    routes = TouristRoute.objects.filter(source='db').in_bulk(ids)
+
+    results = []
+    candidates = []
+    for index, row in enumerate(rows):
+        result, new_route = _check_row(index, row)
+        results.append(result)
+        try:
+            route = routes.get(int(row.get('id', '')))
+        except ValueError:
+            route = None
+        if route is None:
+            result['status'] = 'not_found'
+            result['errors'] = ['Маршрут не найден в базе данных']
+        elif new_route is not None:
+            candidates.append((result, route, new_route))
+
+    existing = _existing_keys([new_route for _, _, new_route in candidates])
+    seen = set()
+    changes = []
+    updated = []
+    for result, route, new_route in candidates:
+        key = _route_key(new_route)
+        if existing.get(key, route.id) != route.id or key in seen:
+            _mark_duplicate(result, key in seen)
+            continue
+        seen.add(key)
+        result['status'] = 'updated'
+        changes.append((route_values(route), -1))
+        for field in _UPDATE_FIELDS:
+            setattr(route, field, getattr(new_route, field))
+        changes.append((route_values(route), 1))
+        updated.append(route)
+
+    if updated:
+        with transaction.atomic():
+            TouristRoute.objects.bulk_update(updated, _UPDATE_FIELDS, batch_size=BATCH_MAX_ROUTES)
+            apply_route_changes(changes)
+            transaction.on_commit(bump_data_version)
+    return results
+
+
+def batch_summary(results):
+    """Число строк по статусам и ошибки строк (для сообщений и JSON ответа)"""
+    summary = {'rows': [{'index': r['index'], 'status': r['status'], 'errors': r['errors']}
+                        for r in results]}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return summary
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.utils import timezone
+
+DATA_VERSION_KEY = 'routes:data_version'
+DATA_CHANGED_AT_KEY = 'routes:data_changed_at'
+
+SEARCH_CACHE_PREFIX = 'ajax_search'
+ROUTES_PAGE_CACHE_PREFIX = 'routes_list'
+SEARCH_CACHE_TIMEOUT = 24 * 60 * 60
+SEARCH_HITS_KEY = 'ajax_search:hits'
+SEARCH_MISSES_KEY = 'ajax_search:misses'
+
+
+def _incr(key):
+    """Атомарный (если позволяет бэкенд) счетчик в кэше"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            return 1
+        return cache.incr(key)
+
+
+def _cache_is_process_local():
+    """Кэш виден только своему процессу (у каждого воркера gunicorn свой)"""
+    return isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _replace_version_file():
+    """Новый файл версии: другой inode и время изменения - новая версия"""
+    path = settings.DATA_VERSION_FILE
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.data_version.')
+    os.close(fd)
+    os.replace(tmp_path, path)
+
+
+def _version_file_stat():
+    try:
+        return os.stat(settings.DATA_VERSION_FILE)
+    except FileNotFoundError:
+        _replace_version_file()
+        return os.stat(settings.DATA_VERSION_FILE)
+
+
+def get_data_version():
+    """Текущая версия данных маршрутов в БД (часть ключей кэша)
+
+    С кэшем процесса (LocMemCache) версия, записанная в него, не дошла бы
+    до других воркеров, и они отдавали бы свои закэшированные страницы
+    бесконечно. Поэтому в этом случае версия - это inode и время изменения
+    файла DATA_VERSION_FILE, общего для всех процессов.
+    """
+    if _cache_is_process_local():
+        stat = _version_file_stat()
+        return f'{stat.st_ino}-{stat.st_mtime_ns}'
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Начальное значение от времени: если ключ вытеснили из кэша,
+        # новая версия не совпадет ни с одной из прежних
+        cache.add(DATA_VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def get_data_changed_at():
+    """Время последнего изменения маршрутов в БД (для Last-Modified)"""
+    if _cache_is_process_local():
+        return datetime.fromtimestamp(_version_file_stat().st_mtime, tz=dt_timezone.utc)
+    changed_at = cache.get(DATA_CHANGED_AT_KEY)
+    if changed_at is None:
+        # Время неизвестно (ключ вытеснили) - считаем, что данные изменились сейчас
+        cache.add(DATA_CHANGED_AT_KEY, timezone.now(), None)
+        changed_at = cache.get(DATA_CHANGED_AT_KEY)
+    return changed_at
+
+
+def bump_data_version():
+    """Меняет версию данных - все закэшированные ответы устаревают"""
+    if _cache_is_process_local():
+        _replace_version_file()
+        return
+    cache.set(DATA_CHANGED_AT_KEY, timezone.now(), None)
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        get_data_version()
+
+
+def normalize_search_query(query):
+    """Запрос в виде, по которому ищется и строится ключ кэша
+
+    Полнотекстовый поиск PostgreSQL не различает регистр и пробелы, так что
+    'Алт', 'алт' и ' АЛТ ' - один запрос. icontains в SQLite различает регистр
+    кириллицы: там запрос остается как есть, иначе первый закэшированный
+    вариант отвечал бы за все.
+    """
+    if connection.vendor == 'postgresql':
+        return ' '.join(query.lower().split())
+    return query
+
+
+def search_cache_key(query):
+    """Ключ ответа поиска; версия данных в ключе делает инвалидацию явной"""
+    digest = hashlib.md5(normalize_search_query(query).encode('utf-8')).hexdigest()
+    return f'{SEARCH_CACHE_PREFIX}:{get_data_version()}:{digest}'
+
+
+def get_cached_search(key):
+    """Закэшированный ответ поиска или None; ведет счетчики попаданий"""
+    payload = cache.get(key)
+    _incr(SEARCH_MISSES_KEY if payload is None else SEARCH_HITS_KEY)
+    return payload
+
+
+def cache_search(key, payload):
+    cache.set(key, payload, SEARCH_CACHE_TIMEOUT)
+
+
+def routes_page_cache_key(source, search_query, cursor, version):
+    """Ключ HTML таблицы routes_list; версия (данных БД или XML файла) в ключе"""
+    digest = hashlib.md5(f'{search_query}\n{cursor}'.encode('utf-8')).hexdigest()
+    return f'{ROUTES_PAGE_CACHE_PREFIX}:{source}:{version}:{digest}'
+
+
+def get_cached_routes_page(key):
+    return cache.get(key)
+
+
+def cache_routes_page(key, html):
+    # Без срока жизни: устаревшие ключи вытесняются, новые появляются со сменой версии
+    cache.set(key, html, None)
+
+
+def search_cache_stats():
+    hits = cache.get(SEARCH_HITS_KEY, 0)
+    misses = cache.get(SEARCH_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'data_version': get_data_version(),
+    }
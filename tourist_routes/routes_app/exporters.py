@@ -0,0 +1,106 @@
+import csv
+import json
+import xml.etree.ElementTree as ET
+import zlib
+from .models import TouristRoute
+
+EXPORT_FIELDS = ['name', 'description', 'length_km', 'duration_days', 'difficulty',
+                 'region', 'best_season', 'kolvo_chel', 'created_at']
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# формат -> (Content-Type, расширение файла)
+EXPORT_FORMATS = {
+    'xml': ('application/xml', 'xml'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: write() просто возвращает строку"""
+
+    def write(self, value):
+        return value
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _rows(queryset, chunk_size):
+    """Маршруты построчно, без загрузки всей таблицы в память"""
+    return queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _iter_xml(rows):
+    yield "<?xml version='1.0' encoding='utf-8'?>\n<tourist_routes version=\"1.0\">\n"
+    for row in rows:
+        route_elem = ET.Element('route')
+        for field, value in zip(EXPORT_FIELDS, row):
+            ET.SubElement(route_elem, field).text = _text(value)
+        yield ET.tostring(route_elem, encoding='unicode') + '\n'
+    yield '</tourist_routes>\n'
+
+
+def _iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_text(value) for value in row])
+
+
+def _iter_ndjson(rows):
+    for row in rows:
+        record = {field: _text(value) for field, value in zip(EXPORT_FIELDS, row)}
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+_WRITERS = {'xml': _iter_xml, 'csv': _iter_csv, 'ndjson': _iter_ndjson}
+
+
+def _buffered(pieces, buffer_size):
+    """Склеивает мелкие строки в блоки байтов; первый блок отдается сразу"""
+    buffer = []
+    size = 0
+    first = True
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if first or size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+            first = False
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_routes(export_format='xml', compress=False, queryset=None,
+                  chunk_size=EXPORT_CHUNK_SIZE, buffer_size=EXPORT_BUFFER_SIZE):
+    """Потоковый экспорт маршрутов из БД: итератор блоков байтов
+
+    Таблица читается через .iterator(chunk_size), поэтому память не зависит
+    от числа маршрутов. compress=True сжимает поток в gzip на лету.
+    """
+    if export_format not in _WRITERS:
+        raise ValueError(f'Неизвестный формат экспорта: {export_format}')
+    if queryset is None:
+        queryset = TouristRoute.objects.filter(source='db')
+
+    chunks = _buffered(_WRITERS[export_format](_rows(queryset, chunk_size)), buffer_size)
+    return _gzipped(chunks) if compress else chunks
@@ -0,0 +1,111 @@
+import random
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+from django.db import connection, transaction
+from .caching import bump_data_version
+from .importer import _build_route
+from .models import TouristRoute
+from .statistics import rebuild_route_statistics
+
+GENERATE_BATCH_SIZE = 5000
+XML_CHUNK_SIZE = 64 * 1024
+
+_PLACES = [
+    'озеру Байкал', 'Телецкому озеру', 'вершине Белухи', 'Эльбрусу', 'перевалу Дятлова',
+    'Кунгурской пещере', 'Куршской косе', 'Онежскому озеру', 'плато Путорана', 'Столбам',
+    'долине гейзеров', 'Кавказскому хребту', 'Ладожским шхерам', 'горе Иремель',
+    'Рускеале', 'Голубым озерам', 'водопадам Шарташа', 'Хибинам', 'Таганаю', 'Зюраткулю',
+]
+_KINDS = [
+    'Тропа к', 'Поход к', 'Сплав к', 'Маршрут к', 'Экспедиция к', 'Велопоход к',
+    'Лыжный переход к', 'Треккинг к',
+]
+_REGIONS = [
+    'Алтай', 'Кавказ', 'Урал', 'Карелия', 'Байкал', 'Камчатка', 'Крым', 'Кольский полуостров',
+    'Саяны', 'Приморье', 'Ленинградская область', 'Калининградская область', 'Красноярский край',
+    'Пермский край', 'Башкортостан', 'Челябинская область',
+]
+_SEASONS = ['лето', 'весна', 'осень', 'зима', 'июль-август', 'май-сентябрь', 'круглый год', '']
+_DESCRIPTIONS = [
+    'Живописный маршрут через хвойный лес с ночевками у воды',
+    'Подъем по каменистой тропе, виды на ледники и долины рек',
+    'Спокойный маршрут для новичков вдоль берега с местами для купания',
+    'Переправы через горные реки и ночевки в палатках на высоте',
+    'Маршрут с посещением старинных деревень и смотровых площадок',
+    'Технически сложный участок с веревочными перилами на перевале',
+]
+_DIFFICULTIES = [value for value, _ in TouristRoute.DIFFICULTY_CHOICES]
+_XML_FIELDS = ('name', 'description', 'length_km', 'duration_days', 'difficulty',
+               'region', 'best_season', 'kolvo_chel', 'created_at')
+
+
+def generate_route_data(count, seed=0, start=0):
+    """Детерминированные маршруты: одинаковые seed и start дают одни и те же данные
+
+    Номер маршрута входит в название, так что маршруты не повторяются ни
+    по ключу БД, ни по ключу XML.
+    """
+    rng = random.Random(seed)
+    created_at = datetime(2024, 1, 1)
+    for i in range(start, start + count):
+        yield {
+            'name': f'{rng.choice(_KINDS)} {rng.choice(_PLACES)} №{i + 1}',
+            'description': f'{rng.choice(_DESCRIPTIONS)}. Протяженность участков до {rng.randint(5, 30)} км в день.',
+            'length_km': f'{rng.uniform(3, 400):.2f}',
+            'duration_days': str(rng.randint(1, 21)),
+            'difficulty': rng.choice(_DIFFICULTIES),
+            'region': rng.choice(_REGIONS),
+            'best_season': rng.choice(_SEASONS),
+            'kolvo_chel': str(rng.randint(1, 30)),
+            'created_at': (created_at + timedelta(minutes=i)).isoformat(),
+        }
+
+
+def generate_routes_to_db(count, seed=0, start=0, batch_size=GENERATE_BATCH_SIZE):
+    """Вставляет маршруты в БД пакетами; возвращает число вставленных маршрутов
+
+    created_at проставляется auto_now_add. Уже существующие маршруты
+    пропускаются; bulk_create(ignore_conflicts=True) возвращает и
+    пропущенные объекты, поэтому вставленные считаются по числу строк
+    до и после, как при импорте из XML. Сводка пересчитывается один раз
+    в конце.
+    """
+    count_before = TouristRoute.objects.count()
+    batch = []
+    for route_data in generate_route_data(count, seed, start):
+        batch.append(_build_route(route_data))
+        if len(batch) >= batch_size:
+            _insert_batch(batch)
+            batch = []
+    if batch:
+        _insert_batch(batch)
+    bump_data_version()
+    rebuild_route_statistics()
+    return TouristRoute.objects.count() - count_before
+
+
+def clear_db_routes():
+    """Удаляет все маршруты БД одним запросом (без сигналов) и пересчитывает сводку"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TouristRoute._meta.db_table}')
+    bump_data_version()
+    rebuild_route_statistics()
+
+
+def _insert_batch(routes):
+    with transaction.atomic():
+        TouristRoute.objects.bulk_create(routes, ignore_conflicts=True)
+
+
+def iter_routes_xml(routes, chunk_size=XML_CHUNK_SIZE):
+    """Байтовые блоки XML документа с маршрутами (для replace_xml_file)"""
+    chunk = bytearray(b"<?xml version='1.0' encoding='utf-8'?>\n<tourist_routes version=\"1.0\">\n")
+    for route_data in routes:
+        fields = ''.join(f'<{field}>{escape(route_data[field])}</{field}>' for field in _XML_FIELDS)
+        chunk += f'<route>{fields}</route>\n'.encode('utf-8')
+        if len(chunk) >= chunk_size:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b'</tourist_routes>\n'
+    yield bytes(chunk)
@@ -0,0 +1,132 @@
+import time
+from decimal import Decimal, InvalidOperation
+from django.db import connection, transaction
+from .caching import bump_data_version
+from .models import TouristRoute
+from .statistics import rebuild_route_statistics
+from .validators import validate_route_data, validate_route_fields
+from .xml_store import iter_routes_from_xml
+
+IMPORT_BATCH_SIZE = 2000
+IMPORT_CHUNK_SIZE = 20000
+MAX_REPORTED_ERRORS = 20
+
+# DecimalField(max_digits=6, decimal_places=2): не больше 9999.99
+_DECIMAL_LIMIT = Decimal('10000')
+_CENT = Decimal('0.01')
+
+
+def _to_decimal(value):
+    number = Decimal(value).quantize(_CENT)
+    if abs(number) >= _DECIMAL_LIMIT:
+        raise InvalidOperation(value)
+    return number
+
+
+def _build_route(route_data):
+    """TouristRoute из строк XML (данные уже прошли validate_route_data)"""
+    kolvo_chel = route_data.get('kolvo_chel', '').strip()
+    return TouristRoute(
+        name=route_data['name'].strip(),
+        description=route_data['description'].strip(),
+        length_km=_to_decimal(route_data['length_km']),
+        duration_days=int(route_data['duration_days']),
+        difficulty=route_data['difficulty'],
+        region=route_data['region'].strip(),
+        best_season=route_data.get('best_season', '').strip(),
+        kolvo_chel=_to_decimal(kolvo_chel) if kolvo_chel else None,
+        source='db',
+    )
+
+
+class _InsertedRows:
+    """Обертка execute_wrapper: суммирует rowcount INSERT запросов
+
+    INSERT ... ON CONFLICT DO NOTHING (INSERT OR IGNORE в SQLite) сообщает
+    в rowcount число действительно вставленных строк, без пропущенных
+    дубликатов - в том числе вставленных параллельно другими писателями.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.lstrip()[:6].upper() == 'INSERT':
+            self.count += max(context['cursor'].rowcount, 0)
+        return result
+
+
+def _insert_chunk(routes, batch_size):
+    """Одна транзакция на чанк; дубликаты по (name, region, length_km) пропускаются
+
+    Возвращает число вставленных маршрутов.
+    """
+    inserted = _InsertedRows()
+    with transaction.atomic(), connection.execute_wrapper(inserted):
+        TouristRoute.objects.bulk_create(routes, batch_size=batch_size, ignore_conflicts=True)
+    return inserted.count
+
+
+def import_routes_from_xml(source, batch_size=IMPORT_BATCH_SIZE, chunk_size=IMPORT_CHUNK_SIZE,
+                           progress=None):
+    """Импортирует маршруты из XML (путь или файловый объект) в БД
+
+    XML читается потоково, каждая строка проверяется validate_route_data и
+    валидаторами полей модели (validate_route_fields), корректные вставляются через bulk_create(ignore_conflicts=True) пачками
+    по batch_size, по chunk_size строк на транзакцию. progress(stats)
+    вызывается после каждого чанка. Возвращает словарь со статистикой.
+    """
+    stats = {
+        'processed': 0,
+        'inserted': 0,
+        'invalid': 0,
+        'duplicates': 0,
+        'seconds': 0.0,
+        'rows_per_second': 0.0,
+        'errors': [],
+    }
+    started = time.perf_counter()
+
+    def report():
+        stats['seconds'] = time.perf_counter() - started
+        if stats['seconds']:
+            stats['rows_per_second'] = stats['processed'] / stats['seconds']
+        if progress is not None:
+            progress(stats)
+
+    chunk = []
+    for position, route_data in enumerate(iter_routes_from_xml(source), start=1):
+        stats['processed'] += 1
+        errors = validate_route_data(route_data)
+        if not errors:
+            try:
+                route = _build_route(route_data)
+            except (InvalidOperation, ValueError):
+                errors = ['Число вне допустимого диапазона']
+            else:
+                # Длины строк и диапазон чисел: иначе DataError в PostgreSQL прервал бы импорт
+                errors = validate_route_fields(route)
+                if not errors:
+                    chunk.append(route)
+        if errors:
+            stats['invalid'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append(f'Маршрут #{position}: {"; ".join(errors)}')
+            continue
+
+        if len(chunk) >= chunk_size:
+            stats['inserted'] += _insert_chunk(chunk, batch_size)
+            chunk = []
+            report()
+
+    if chunk:
+        stats['inserted'] += _insert_chunk(chunk, batch_size)
+
+    # bulk_create не отправляет post_save - сбрасываем кэши и пересчитываем сводку явно
+    transaction.on_commit(bump_data_version)
+    rebuild_route_statistics()
+
+    stats['duplicates'] = stats['processed'] - stats['invalid'] - stats['inserted']
+    report()
+    return stats
@@ -0,0 +1,73 @@
+import time
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+from routes_app.batch import BATCH_MAX_ROUTES, BATCH_PREFIX
+from routes_app.management.commands.bench_routes import BENCH_CACHES
+from routes_app.models import TouristRoute
+
+
+def _route_data(name, i):
+    return {
+        'name': f'{name}-{i}',
+        'description': 'Маршрут для замера пакетного добавления',
+        'length_km': f'{10 + i % 90}.5',
+        'duration_days': str(1 + i % 14),
+        'difficulty': ('легкий', 'средний', 'сложный')[i % 3],
+        'region': 'Бенчмарк',
+        'best_season': 'лето',
+        'kolvo_chel': str(2 + i % 20),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает добавление N маршрутов N запросами к форме add_route и одним '
+            'запросом пакетной формы. Работает на тестовой БД с отдельным кэшем '
+            'процесса; созданные маршруты удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', type=int, default=100, help='Количество маршрутов (N)')
+        parser.add_argument('--keepdb', action='store_true', help='Не пересоздавать тестовую БД')
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], CACHES=BENCH_CACHES):
+                self._bench(min(options['routes'], BATCH_MAX_ROUTES))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+    def _bench(self, count):
+        prefix = f'bench-batch-{int(time.time())}'
+        client = Client()
+
+        # N последовательных POST на форму добавления одного маршрута
+        started = time.perf_counter()
+        for i in range(count):
+            client.post(reverse('add_route'), {**_route_data(f'{prefix}-single', i), 'save_to': 'db'})
+        single_seconds = time.perf_counter() - started
+
+        # Один POST пакетной формы с теми же N маршрутами
+        data = {f'{BATCH_PREFIX}-TOTAL_FORMS': str(count)}
+        for i in range(count):
+            for field, value in _route_data(f'{prefix}-batch', i).items():
+                data[f'{BATCH_PREFIX}-{i}-{field}'] = value
+        started = time.perf_counter()
+        response = client.post(reverse('add_routes_batch'), data,
+                               headers={'x-requested-with': 'XMLHttpRequest'})
+        batch_seconds = time.perf_counter() - started
+
+        created = {
+            'single': TouristRoute.objects.filter(name__startswith=f'{prefix}-single-').count(),
+            'batch': response.json().get('created', 0),
+        }
+        # delete() по queryset отправляет сигналы - сводка маршрутов остается согласованной
+        TouristRoute.objects.filter(name__startswith=prefix).delete()
+
+        self.stdout.write(f'Маршрутов: {count}')
+        self.stdout.write(f'По одному: {single_seconds:.2f} с ({count / single_seconds:.0f} маршрутов/с), '
+                          f'создано {created["single"]}')
+        self.stdout.write(f'Пакетом:   {batch_seconds:.2f} с ({count / batch_seconds:.0f} маршрутов/с), '
+                          f'создано {created["batch"]}')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: x{single_seconds / batch_seconds:.1f}'))
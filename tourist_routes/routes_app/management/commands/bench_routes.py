@@ -0,0 +1,218 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import django
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+from routes_app.generator import (
+    clear_db_routes, generate_route_data, generate_routes_to_db, iter_routes_xml,
+)
+from routes_app.xml_store import invalidate_xml_cache, replace_xml_file
+
+SEARCH_WORDS = ['Байкал', 'Эльбрус', 'Хибин', 'Таганай', 'Белух', 'Карели', 'озеро', 'пещер']
+# Отдельный кэш процесса: замеры не трогают общий кэш (Redis и т.п.)
+BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': 'bench-routes'}}
+
+
+def _percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _read_response(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = ('Замеры представлений routes_app (список БД и XML, AJAX поиск, добавление, '
+            'загрузка и скачивание XML) на синтетических данных разного объема. '
+            'Работает на тестовой БД и временном XML файле, рабочие данные не '
+            'затрагиваются. Результаты пишутся в JSON для сравнения версий.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,100000,1000000',
+                            help='Объемы данных через запятую (по умолчанию 1000,100000,1000000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Запросов на сценарий (по умолчанию 20)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора данных')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--compare', help='JSON предыдущего запуска: вывести изменение p50')
+        parser.add_argument('--keepdb', action='store_true', help='Не пересоздавать тестовую БД')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes: ожидаются целые числа через запятую')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        self.repeat = options['repeat']
+        self.seed = options['seed']
+        self.client = Client()
+        results = []
+
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        # Свой XML файл (и снимок рядом) во временном каталоге: рабочий файл не трогается
+        xml_dir = tempfile.mkdtemp()
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], CACHES=BENCH_CACHES,
+                                   XML_FILE_PATH=os.path.join(xml_dir, 'tourist_routes.xml')):
+                for size in sizes:
+                    results.extend(self._bench_size(size))
+        finally:
+            invalidate_xml_cache()
+            shutil.rmtree(xml_dir)
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'git_revision': _git_revision(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sizes': sizes,
+                'repeat': self.repeat,
+                'seed': self.seed,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+        if baseline is not None:
+            self._print_comparison(baseline, report)
+
+    def _bench_size(self, size):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nМаршрутов: {size}'))
+        results = []
+
+        started = time.perf_counter()
+        clear_db_routes()
+        generate_routes_to_db(size, self.seed)
+        results.append(self._setup_result('generate_db', size, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        replace_xml_file(iter_routes_xml(generate_route_data(size, self.seed)))
+        results.append(self._setup_result('generate_xml', size, time.perf_counter() - started))
+        invalidate_xml_cache()
+
+        routes_url = reverse('routes_list')
+        search_url = reverse('ajax_search')
+        add_url = reverse('add_route')
+        ajax = {'x-requested-with': 'XMLHttpRequest'}
+        scenarios = [
+            ('routes_list_db', lambda n: self.client.get(routes_url, {'source': 'db'})),
+            ('routes_list_db_search', lambda n: self.client.get(
+                routes_url, {'source': 'db', 'search': SEARCH_WORDS[n % len(SEARCH_WORDS)]})),
+            ('routes_list_xml', lambda n: self.client.get(routes_url, {'source': 'xml'})),
+            ('routes_list_xml_search', lambda n: self.client.get(
+                routes_url, {'source': 'xml', 'search': SEARCH_WORDS[n % len(SEARCH_WORDS)]})),
+            ('ajax_search', lambda n: self.client.get(
+                search_url, {'q': SEARCH_WORDS[n % len(SEARCH_WORDS)]}, headers=ajax)),
+            ('add_route_db', lambda n: self.client.post(add_url, self._new_route(size, n, 'db'))),
+            ('add_route_xml', lambda n: self.client.post(add_url, self._new_route(size, n, 'xml'))),
+            ('download_xml', lambda n: self.client.get(reverse('download_xml'))),
+        ]
+        for name, request in scenarios:
+            results.append(self._measure(name, size, request, self.repeat))
+
+        # Загрузка заменяет XML файлом того же объема; с импортом все маршруты - дубликаты
+        upload = b''.join(iter_routes_xml(generate_route_data(size, self.seed)))
+        for name, import_to_db in (('upload_xml', False), ('upload_xml_import', True)):
+            data = {'xml_file': SimpleUploadedFile('routes.xml', upload, 'text/xml')}
+            if import_to_db:
+                data['import_to_db'] = 'on'
+            results.append(self._measure(name, size, lambda n: self.client.post(reverse('upload_xml'), data), 1))
+        return results
+
+    def _new_route(self, size, n, save_to):
+        # Номера после сгенерированных маршрутов - новые, не дубликаты
+        start = size + n + (self.repeat if save_to == 'xml' else 0)
+        route_data = next(generate_route_data(1, self.seed + n, start))
+        return {**route_data, 'save_to': save_to}
+
+    def _measure(self, name, size, request, repeat):
+        """Первый запрос (пустые кэши) и repeat запросов подряд"""
+        invalidate_xml_cache()
+        cache.clear()
+
+        timings = []
+        statuses = {}
+        with CaptureQueriesContext(connection) as queries:
+            for n in range(repeat):
+                started = time.perf_counter()
+                response = request(n)
+                size_bytes = _read_response(response)
+                timings.append(time.perf_counter() - started)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+        first = timings[0]
+        timings.sort()
+        result = {
+            'scenario': name,
+            'rows': size,
+            'requests': repeat,
+            'first_ms': round(first * 1000, 2),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+            'p50_ms': round(_percentile(timings, 0.50) * 1000, 2),
+            'p95_ms': round(_percentile(timings, 0.95) * 1000, 2),
+            'max_ms': round(timings[-1] * 1000, 2),
+            'queries_per_request': round(len(queries) / repeat, 1),
+            'response_bytes': size_bytes,
+            'statuses': statuses,
+        }
+        self.stdout.write(
+            f'  {name:<24} первый {result["first_ms"]:>9.1f} мс  p50 {result["p50_ms"]:>9.1f} мс  '
+            f'p95 {result["p95_ms"]:>9.1f} мс  запросов к БД {result["queries_per_request"]:>5}  {statuses}'
+        )
+        return result
+
+    def _setup_result(self, name, size, seconds):
+        self.stdout.write(f'  {name:<24} {seconds:.1f} с ({size / seconds:.0f} маршрутов/с)')
+        return {'scenario': name, 'rows': size, 'seconds': round(seconds, 3),
+                'rows_per_second': round(size / seconds)}
+
+    def _print_comparison(self, baseline, report):
+        """p50 (или время подготовки) против предыдущего запуска"""
+        def key_values(data):
+            return {(r['scenario'], r['rows']): r.get('p50_ms', r.get('seconds')) for r in data['results']}
+
+        old = key_values(baseline)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nСравнение с {baseline["meta"].get("git_revision")} ({baseline["meta"].get("created_at")})'
+        ))
+        for (scenario, rows), value in key_values(report).items():
+            previous = old.get((scenario, rows))
+            if not previous:
+                continue
+            change = (value - previous) / previous * 100
+            line = f'  {scenario:<24} {rows:>8}  {previous:>10} -> {value:<10} {change:+.0f}%'
+            if change > 10:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
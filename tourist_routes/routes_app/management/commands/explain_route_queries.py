@@ -0,0 +1,65 @@
+import re
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from routes_app.models import TouristRoute
+
+_EXECUTION_TIME_RE = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы запросов списка и поиска маршрутов. '
+            'На PostgreSQL с --compare сравнивает их с принудительным seq scan.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', default='Алт', help='Строка для поиска icontains')
+        parser.add_argument('--region', default=None, help='Регион для фильтра (по умолчанию - любой из БД)')
+        parser.add_argument('--compare', action='store_true',
+                            help='PostgreSQL: выполнить те же запросы без индексов (enable_indexscan=off)')
+
+    def handle(self, *args, **options):
+        routes = TouristRoute.objects.filter(source='db')
+        region = options['region'] or routes.values_list('region', flat=True).first() or ''
+        query = options['query']
+        queries = [
+            ('Список (source, created_at)', routes.order_by('-created_at', '-id')[:50]),
+            ('Фильтр по региону', routes.filter(region=region)[:50]),
+            ('Фильтр по сложности', routes.filter(difficulty='сложный')[:50]),
+            ('Поиск icontains', routes.filter(
+                models.Q(name__icontains=query) |
+                models.Q(description__icontains=query) |
+                models.Q(region__icontains=query) |
+                models.Q(best_season__icontains=query)
+            )[:15]),
+        ]
+
+        is_postgres = connection.vendor == 'postgresql'
+        self.stdout.write(f'База: {connection.vendor}, маршрутов: {routes.count()}')
+        for title, queryset in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{title}'))
+            if not is_postgres:
+                self.stdout.write(queryset.explain())
+                continue
+
+            plan = queryset.explain(analyze=True)
+            self.stdout.write(plan)
+            if options['compare']:
+                seq_plan = self._explain_without_indexes(queryset)
+                self.stdout.write(self.style.WARNING('Без индексов:'))
+                self.stdout.write(seq_plan)
+                self.stdout.write(
+                    f'Время: с индексами {self._execution_time(plan)} мс, '
+                    f'без индексов {self._execution_time(seq_plan)} мс'
+                )
+
+    def _explain_without_indexes(self, queryset):
+        """План того же запроса с запрещенными индексными сканированиями"""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_indexscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+                cursor.execute('SET LOCAL enable_indexonlyscan = off')
+            return queryset.explain(analyze=True)
+
+    def _execution_time(self, plan):
+        match = _EXECUTION_TIME_RE.search(plan)
+        return match.group(1) if match else '?'
@@ -0,0 +1,31 @@
+import sys
+from django.core.management.base import BaseCommand
+from routes_app.exporters import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_routes
+
+
+class Command(BaseCommand):
+    help = 'Потоковый экспорт маршрутов из БД в XML, CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='xml')
+        parser.add_argument('--gzip', action='store_true', help='Сжать вывод в gzip')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Строк, читаемых из БД за раз')
+        parser.add_argument('-o', '--output', default='-', help='Файл для записи (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        chunks = export_routes(options['format'], compress=options['gzip'],
+                               chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Записано {written} байт в {options["output"]}'))
@@ -0,0 +1,51 @@
+import time
+from itertools import chain
+from django.core.management.base import BaseCommand
+from routes_app.generator import (
+    clear_db_routes, generate_route_data, generate_routes_to_db, iter_routes_xml,
+)
+from routes_app.xml_store import (
+    ensure_xml_file_exists, iter_routes_from_xml, replace_xml_file, xml_file_path,
+)
+
+
+class Command(BaseCommand):
+    help = ('Создает N синтетических маршрутов в БД и/или XML. Данные определяются '
+            '--seed и --start: повторный запуск с теми же параметрами дает те же маршруты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Количество маршрутов')
+        parser.add_argument('--target', choices=['db', 'xml', 'both'], default='db',
+                            help='Куда записать маршруты (по умолчанию db)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора (по умолчанию 42)')
+        parser.add_argument('--start', type=int, default=0,
+                            help='Номер первого маршрута - чтобы дописать новые маршруты к уже созданным')
+        parser.add_argument('--clear', action='store_true',
+                            help='Сначала удалить все маршруты из выбранного хранилища')
+        parser.add_argument('--xml-path', help='XML файл (по умолчанию settings.XML_FILE_PATH)')
+
+    def handle(self, *args, **options):
+        count, seed, start = options['count'], options['seed'], options['start']
+        target = options['target']
+
+        if target in ('db', 'both'):
+            started = time.perf_counter()
+            if options['clear']:
+                clear_db_routes()
+            created = generate_routes_to_db(count, seed, start)
+            self.stdout.write(self.style.SUCCESS(
+                f'БД: {created} маршрутов за {time.perf_counter() - started:.1f} с'
+            ))
+
+        if target in ('xml', 'both'):
+            started = time.perf_counter()
+            path = options['xml_path'] or xml_file_path()
+            ensure_xml_file_exists(path)
+            routes = generate_route_data(count, seed, start)
+            if not options['clear']:
+                # Текущие маршруты файла сохраняются, новые дописываются после них
+                routes = chain(iter_routes_from_xml(path), routes)
+            replace_xml_file(iter_routes_xml(routes), path)
+            self.stdout.write(self.style.SUCCESS(
+                f'XML: {count} маршрутов за {time.perf_counter() - started:.1f} с ({path})'
+            ))
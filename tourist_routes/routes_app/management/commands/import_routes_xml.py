@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from routes_app.importer import IMPORT_BATCH_SIZE, IMPORT_CHUNK_SIZE, import_routes_from_xml
+
+
+class Command(BaseCommand):
+    help = 'Импортирует маршруты из XML файла в базу данных (потоково, пачками bulk_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к XML файлу с маршрутами')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Строк в одном INSERT')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(
+                f'  обработано {stats["processed"]}, '
+                f'ошибок {stats["invalid"]}, '
+                f'{stats["rows_per_second"]:.0f} строк/с'
+            )
+
+        try:
+            stats = import_routes_from_xml(options['path'], batch_size=options['batch_size'],
+                                           chunk_size=options['chunk_size'], progress=progress)
+        except FileNotFoundError:
+            raise CommandError(f'Файл не найден: {options["path"]}')
+
+        for error in stats['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено {stats["inserted"]}, дубликатов {stats["duplicates"]}, '
+            f'с ошибками {stats["invalid"]} из {stats["processed"]} '
+            f'за {stats["seconds"]:.2f} с ({stats["rows_per_second"]:.0f} строк/с)'
+        ))
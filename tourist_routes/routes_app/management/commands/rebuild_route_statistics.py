@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from routes_app.statistics import rebuild_route_statistics
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает сводку маршрутов по регионам и сложности (для запуска по расписанию)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        groups = rebuild_route_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f'Сводка пересчитана: {groups} групп за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from routes_app.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = ('Прогревает процесс: импорт представлений, компиляция шаблонов, загрузка '
+            'маршрутов XML с индексом поиска, проверка БД. Заодно пишет снимок XML '
+            'для воркеров; gunicorn с gunicorn.conf.py выполняет тот же прогрев в мастере.')
+
+    def handle(self, *args, **options):
+        try:
+            steps = warm_up()
+        except Exception as error:
+            raise CommandError(f'Прогрев не удался: {error}')
+        for name, (result, seconds) in steps.items():
+            self.stdout.write(f'  {name:<10} {result!s:<12} {seconds * 1000:.1f} мс')
+        total = sum(seconds for _, seconds in steps.values())
+        self.stdout.write(self.style.SUCCESS(f'Прогрев завершен за {total:.2f} с'))
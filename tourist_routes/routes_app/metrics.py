@@ -0,0 +1,407 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+# Состояние процесса пишется в файл не чаще раза в секунду
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_FILE_PREFIX = 'metrics-'
+# Сумма метрик завершенных воркеров (см. retire_process_metrics)
+METRICS_EXITED_FILE = f'{METRICS_FILE_PREFIX}exited.json'
+METRICS_TMP_PREFIX = '.metrics.'
+
+# Гистограммы: имя -> (описание, границы корзин)
+HISTOGRAMS = {
+    'routes_request_duration_seconds': ('Время обработки запроса', DURATION_BUCKETS),
+    'routes_db_duration_seconds': ('Время SQL запросов за запрос', DURATION_BUCKETS),
+    'routes_template_duration_seconds': ('Время рендеринга шаблонов за запрос', DURATION_BUCKETS),
+    'routes_xml_duration_seconds': ('Время работы с XML файлом за запрос', DURATION_BUCKETS),
+    'routes_response_size_bytes': ('Размер ответа', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'routes_requests_total': 'Число запросов',
+    'routes_db_queries_total': 'Число SQL запросов',
+}
+# Категория замера -> (гистограмма, имя в Server-Timing)
+TIMING_CATEGORIES = {
+    'db': ('routes_db_duration_seconds', 'db'),
+    'template': ('routes_template_duration_seconds', 'tpl'),
+    'xml': ('routes_xml_duration_seconds', 'xml'),
+}
+
+# Замеры текущего запроса; contextvar переходит и в потоки sync_to_async
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Суммарное время и число операций по категориям за один запрос"""
+
+    __slots__ = ('durations', 'counts', 'running')
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        # Категории, блок которых сейчас выполняется (см. timed)
+        self.running = set()
+
+    def add(self, category, seconds):
+        self.durations[category] = self.durations.get(category, 0.0) + seconds
+        self.counts[category] = self.counts.get(category, 0) + 1
+
+
+@contextmanager
+def timed(category):
+    """Добавляет время блока к категории текущего запроса (вне запроса - ничего)
+
+    Вложенный блок той же категории (save_route_to_xml вызывает
+    get_routes_from_xml) не замеряется: его время уже входит во внешний.
+    """
+    timings = _current.get()
+    if timings is None or category in timings.running:
+        yield
+        return
+    timings.running.add(category)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.running.discard(category)
+        timings.add(category, time.perf_counter() - started)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Обертка connection.execute_wrapper: время и число SQL запросов"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+
+
+def install_db_wrapper(connection, **kwargs):
+    """Ставит обертку на соединение насовсем (обработчик connection_created)
+
+    Соединения в async представлениях живут в потоках sync_to_async, поэтому
+    обертка ставится на каждое соединение, а не на время запроса.
+    """
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django с замером времени рендеринга"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class MetricsStore:
+    """Гистограммы и счетчики процесса
+
+    Каждый процесс периодически пишет свое состояние в METRICS_DIR/metrics-<pid>.json;
+    /metrics суммирует файлы всех процессов (воркеров gunicorn). После fork
+    состояние родителя сбрасывается, чтобы не считать его дважды.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._histograms = {}
+        self._counters = {}
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def record(self, observations=(), increments=()):
+        """Добавляет значения гистограмм (имя, метки, значение) и счетчиков (имя, метки, прирост)"""
+        with self._lock:
+            self._check_fork()
+            for name, labels, value in observations:
+                key = (name, labels)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = [[0] * (len(HISTOGRAMS[name][1]) + 1), 0.0, 0]
+                histogram[0][bisect_left(HISTOGRAMS[name][1], value)] += 1
+                histogram[1] += value
+                histogram[2] += 1
+            for name, labels, amount in increments:
+                key = (name, labels)
+                self._counters[key] = self._counters.get(key, 0) + amount
+
+    def state(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'histograms': [[name, list(labels), counts[:], total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()],
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+            }
+
+    def flush(self, directory, force=False):
+        """Пишет состояние процесса в файл (атомарно), не чаще METRICS_FLUSH_INTERVAL"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        _write_state(directory, _process_file_name(os.getpid()), self.state())
+
+
+store = MetricsStore()
+
+
+def _process_file_name(pid):
+    return f'{METRICS_FILE_PREFIX}{pid}.json'
+
+
+def _write_state(directory, name, state):
+    """Пишет состояние в METRICS_DIR/name атомарно (через временный файл)"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=METRICS_TMP_PREFIX, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(state, tmp_file)
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def clear_metrics_dir(directory=None):
+    """Удаляет файлы метрик всех процессов (при старте gunicorn)"""
+    directory = directory or settings.METRICS_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if (name.startswith(METRICS_FILE_PREFIX) and name.endswith('.json')) or name.startswith(METRICS_TMP_PREFIX):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def retire_process_metrics(pid, directory=None):
+    """Переносит метрики завершенного процесса в общий файл и удаляет его файл
+
+    Вызывается в мастере gunicorn (child_exit), так что общий файл пишет
+    один процесс. Счетчики в /metrics/ не уменьшаются, а число файлов не
+    растет с каждым перезапуском воркера.
+    """
+    directory = directory or settings.METRICS_DIR
+    path = os.path.join(directory, _process_file_name(pid))
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return
+    except ValueError:
+        os.unlink(path)
+        return
+    states = [state]
+    try:
+        with open(os.path.join(directory, METRICS_EXITED_FILE)) as f:
+            states.append(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+    histograms, counters = _merge(states)
+    _write_state(directory, METRICS_EXITED_FILE, {
+        'histograms': [[name, [list(pair) for pair in labels], counts, total, count]
+                       for (name, labels), (counts, total, count) in histograms.items()],
+        'counters': [[name, [list(pair) for pair in labels], value]
+                     for (name, labels), value in counters.items()],
+    })
+    os.unlink(path)
+
+
+def _merge(states):
+    histograms = {}
+    counters = {}
+    for state in states:
+        for name, labels, counts, total, count in state['histograms']:
+            if name not in HISTOGRAMS:
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+        for name, labels, value in state['counters']:
+            if name not in COUNTERS:
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _read_states(directory):
+    states = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return states
+    for name in names:
+        if not (name.startswith(METRICS_FILE_PREFIX) and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                states.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return states
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def render_metrics(directory=None):
+    """Метрики всех процессов в текстовом формате Prometheus"""
+    directory = directory or settings.METRICS_DIR
+    store.flush(directory, force=True)
+    histograms, counters = _merge(_read_states(directory))
+
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    # Потоковый ответ: размер известен, только если задан заголовок (FileResponse)
+    length = response.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+class PerformanceMiddleware:
+    """Замеры запроса: SQL, шаблоны, XML, размер ответа
+
+    Время по категориям отдается в заголовке Server-Timing и копится в
+    гистограммах по имени представления для /metrics. Ставится первым в
+    MIDDLEWARE, чтобы total включал все остальные middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = settings.METRICS_DIR
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, timings, elapsed):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        labels = (('view', view),)
+
+        observations = [('routes_request_duration_seconds', labels, elapsed)]
+        increments = [('routes_requests_total', labels + (('method', request.method),
+                                                          ('status', str(response.status_code))), 1)]
+        server_timing = []
+        for category, (histogram, timing_name) in TIMING_CATEGORIES.items():
+            duration = timings.durations.get(category)
+            if duration is None:
+                continue
+            count = timings.counts[category]
+            observations.append((histogram, labels, duration))
+            server_timing.append(f'{timing_name};dur={duration * 1000:.2f};desc="{count}"')
+        server_timing.append(f'total;dur={elapsed * 1000:.2f}')
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join(([existing] if existing else []) + server_timing)
+
+        if 'db' in timings.counts:
+            increments.append(('routes_db_queries_total', labels, timings.counts['db']))
+        size = _response_size(response)
+        if size is not None:
+            observations.append(('routes_response_size_bytes', labels, size))
+        store.record(observations, increments)
+        try:
+            store.flush(self.directory)
+        except OSError:
+            pass
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes_app', '0005_touristroute_source_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='touristroute',
+            index=models.Index(fields=['source', '-created_at', '-id'], name='route_source_created_idx'),
+        ),
+    ]
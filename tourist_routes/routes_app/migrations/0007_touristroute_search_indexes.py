@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:48
+
+from django.db import migrations, models
+
+# Текстовые поля, по которым идет поиск через icontains
+TRIGRAM_COLUMNS = ['name', 'description', 'region', 'best_season']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Триграммные GIN индексы для icontains (только PostgreSQL)
+
+    Django компилирует icontains в UPPER("col"::text) LIKE UPPER('%q%'),
+    поэтому индекс строится по тому же выражению.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Сборка PostgreSQL без contrib: поиск работает, но без индексов
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS route_{column}_trgm_idx '
+            f'ON routes_app_touristroute USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS route_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes_app', '0006_touristroute_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='touristroute',
+            index=models.Index(fields=['source', 'region'], name='route_source_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristroute',
+            index=models.Index(fields=['source', 'difficulty'], name='route_source_difficulty_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:50
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION routes_app_touristroute_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.region, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.best_season, '') || ' ' || coalesce(NEW.difficulty, '')), 'C') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER route_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description, region, best_season, difficulty
+    ON routes_app_touristroute
+    FOR EACH ROW EXECUTE FUNCTION routes_app_touristroute_search_vector_update();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS route_search_vector_update ON routes_app_touristroute;
+DROP FUNCTION IF EXISTS routes_app_touristroute_search_vector_update();
+DROP INDEX IF EXISTS route_search_vector_idx;
+"""
+
+
+def create_search_vector_trigger(apps, schema_editor):
+    """Триггер, поддерживающий search_vector, и GIN индекс (только PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_TRIGGER_SQL)
+    # Заполняем вектор для существующих строк через тот же триггер
+    schema_editor.execute('UPDATE routes_app_touristroute SET name = name')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS route_search_vector_idx '
+        'ON routes_app_touristroute USING gin (search_vector)'
+    )
+
+
+def drop_search_vector_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes_app', '0007_touristroute_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristroute',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector_trigger, drop_search_vector_trigger),
+    ]
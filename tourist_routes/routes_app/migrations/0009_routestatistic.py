@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:09
+
+from django.db import migrations, models
+
+
+def build_statistics(apps, schema_editor):
+    """Начальная сводка по маршрутам из БД (та же агрегация, что в rebuild_route_statistics)"""
+    TouristRoute = apps.get_model('routes_app', 'TouristRoute')
+    RouteStatistic = apps.get_model('routes_app', 'RouteStatistic')
+    has_size = models.Q(kolvo_chel__isnull=False)
+    rows = (TouristRoute.objects.filter(source='db')
+            .values('region', 'difficulty')
+            .annotate(
+                routes_count=models.Count('id'),
+                total_length_km=models.Sum('length_km', default=0),
+                total_duration_days=models.Sum('duration_days', default=0),
+                group_size_unknown=models.Count('id', filter=models.Q(kolvo_chel__isnull=True)),
+                group_size_1_4=models.Count('id', filter=has_size & models.Q(kolvo_chel__lt=5)),
+                group_size_5_9=models.Count('id', filter=has_size & models.Q(kolvo_chel__gte=5, kolvo_chel__lt=10)),
+                group_size_10_19=models.Count('id', filter=has_size & models.Q(kolvo_chel__gte=10, kolvo_chel__lt=20)),
+                group_size_20_plus=models.Count('id', filter=has_size & models.Q(kolvo_chel__gte=20)),
+            )
+            .order_by())
+    RouteStatistic.objects.bulk_create([RouteStatistic(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes_app', '0008_touristroute_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=100, verbose_name='Регион')),
+                ('difficulty', models.CharField(choices=[('легкий', 'Легкий'), ('средний', 'Средний'), ('сложный', 'Сложный')], max_length=10, verbose_name='Сложность')),
+                ('routes_count', models.IntegerField(default=0, verbose_name='Количество маршрутов')),
+                ('total_length_km', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Суммарная протяженность (км)')),
+                ('total_duration_days', models.BigIntegerField(default=0, verbose_name='Суммарная продолжительность (дней)')),
+                ('group_size_unknown', models.IntegerField(default=0, verbose_name='Количество человек не указано')),
+                ('group_size_1_4', models.IntegerField(default=0, verbose_name='До 5 человек')),
+                ('group_size_5_9', models.IntegerField(default=0, verbose_name='5-9 человек')),
+                ('group_size_10_19', models.IntegerField(default=0, verbose_name='10-19 человек')),
+                ('group_size_20_plus', models.IntegerField(default=0, verbose_name='20 человек и больше')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('region', 'difficulty'), name='route_statistic_group_uniq')],
+            },
+        ),
+        migrations.RunPython(build_statistics, migrations.RunPython.noop),
+    ]
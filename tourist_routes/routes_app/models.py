@@ -1,5 +1,13 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
+
+class TouristRouteManager(models.Manager):
+    def get_queryset(self):
+        # Поисковый вектор нужен только самой базе - не тянем его в Python
+        return super().get_queryset().defer('search_vector')
+
+
 class TouristRoute(models.Model):
     DIFFICULTY_CHOICES = [
         ('легкий', 'Легкий'),
@@ -18,9 +26,55 @@ class TouristRoute(models.Model):
     kolvo_chel = models.DecimalField(max_digits=6, decimal_places=2,verbose_name="Количество человек", blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     source = models.CharField(max_length=10, choices=[('db', 'База данных'), ('xml', 'XML файл')], default='db', verbose_name="Источник данных")
+    # Заполняется триггером в PostgreSQL (см. миграцию 0008), в SQLite всегда пустой
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = TouristRouteManager()
     
     class Meta:
         unique_together = ['name', 'region', 'length_km']
+        indexes = [
+            # Список маршрутов: фильтр по источнику и постраничный вывод по (created_at, id)
+            models.Index(fields=['source', '-created_at', '-id'], name='route_source_created_idx'),
+            models.Index(fields=['source', 'region'], name='route_source_region_idx'),
+            models.Index(fields=['source', 'difficulty'], name='route_source_difficulty_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class RouteStatistic(models.Model):
+    """Сводка по маршрутам из БД для пары регион x сложность
+
+    Обновляется сигналами при сохранении и удалении маршрута и полностью
+    пересчитывается командой rebuild_route_statistics (см. statistics.py).
+    Счетчики без ограничения >= 0: расхождение до пересчета не должно
+    ломать сохранение маршрута.
+    """
+    region = models.CharField(max_length=100, verbose_name="Регион")
+    difficulty = models.CharField(max_length=10, choices=TouristRoute.DIFFICULTY_CHOICES, verbose_name="Сложность")
+    routes_count = models.IntegerField(default=0, verbose_name="Количество маршрутов")
+    total_length_km = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Суммарная протяженность (км)")
+    total_duration_days = models.BigIntegerField(default=0, verbose_name="Суммарная продолжительность (дней)")
+    # Распределение по количеству человек (kolvo_chel)
+    group_size_unknown = models.IntegerField(default=0, verbose_name="Количество человек не указано")
+    group_size_1_4 = models.IntegerField(default=0, verbose_name="До 5 человек")
+    group_size_5_9 = models.IntegerField(default=0, verbose_name="5-9 человек")
+    group_size_10_19 = models.IntegerField(default=0, verbose_name="10-19 человек")
+    group_size_20_plus = models.IntegerField(default=0, verbose_name="20 человек и больше")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'difficulty'], name='route_statistic_group_uniq'),
+        ]
+
+    @property
+    def avg_length_km(self):
+        return self.total_length_km / self.routes_count if self.routes_count else None
+
+    @property
+    def avg_duration_days(self):
+        return self.total_duration_days / self.routes_count if self.routes_count else None
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.region} / {self.difficulty}'
@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from django.db import models
+
+ROUTES_PER_PAGE = 50
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(route):
+    """Курсор на маршрут из БД: '<created_at в микросекундах>-<id>'"""
+    return f'{(route.created_at - _EPOCH) // _MICROSECOND}-{route.id}'
+
+
+def decode_cursor(value):
+    """Разбирает курсор в пару (created_at, id); None если курсор некорректный"""
+    try:
+        micros, route_id = value.split('-')
+        return _EPOCH + timedelta(microseconds=int(micros)), int(route_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _keyset_queryset(queryset, cursor):
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        created_at, route_id = position
+        queryset = queryset.filter(
+            models.Q(created_at__lt=created_at) |
+            models.Q(created_at=created_at, id__lt=route_id)
+        )
+    return queryset
+
+
+def _split_page(routes, per_page):
+    if len(routes) > per_page:
+        routes = routes[:per_page]
+        return routes, encode_cursor(routes[-1])
+    return routes, None
+
+
+def keyset_page(queryset, cursor=None, per_page=ROUTES_PER_PAGE):
+    """Страница маршрутов из БД по ключу (created_at, id), от новых к старым
+
+    Вместо OFFSET используется условие "строго старше курсора", поэтому
+    стоимость запроса не зависит от номера страницы. Возвращает пару
+    (маршруты страницы, курсор следующей страницы или None).
+    """
+    queryset = _keyset_queryset(queryset, cursor)
+    return _split_page(list(queryset[:per_page + 1]), per_page)
+
+
+async def akeyset_page(queryset, cursor=None, per_page=ROUTES_PER_PAGE):
+    """Асинхронный вариант keyset_page (async ORM)"""
+    queryset = _keyset_queryset(queryset, cursor)
+    return _split_page([route async for route in queryset[:per_page + 1]], per_page)
+
+
+def xml_page(routes, cursor=None, per_page=ROUTES_PER_PAGE, positions=None):
+    """Страница маршрутов из XML в порядке файла
+
+    Курсор - позиция маршрута, с которой начинается страница; файл только
+    дописывается, так что позиции не смещаются. positions - отсортированные
+    позиции подходящих маршрутов (результат поиска), по умолчанию все.
+    """
+    try:
+        start = max(int(cursor), 0) if cursor else 0
+    except ValueError:
+        start = 0
+
+    if positions is None:
+        positions = range(len(routes))
+    first = bisect_left(positions, start)
+    page_positions = positions[first:first + per_page + 1]
+
+    page = [routes[position] for position in page_positions[:per_page]]
+    if len(page_positions) > per_page:
+        return page, str(page_positions[per_page])
+    return page, None
@@ -0,0 +1,62 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, models
+from .models import TouristRoute
+
+SEARCH_CONFIG = 'russian'
+SEARCH_RESULTS_LIMIT = 15
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _prefix_search_query(query):
+    """tsquery вида 'слово1:* & слово2:*' - для поиска по мере набора"""
+    words = _WORD_RE.findall(query)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words),
+                       search_type='raw', config=SEARCH_CONFIG)
+
+
+def _icontains_filter(query):
+    return (
+        models.Q(name__icontains=query) |
+        models.Q(description__icontains=query) |
+        models.Q(region__icontains=query) |
+        models.Q(best_season__icontains=query) |
+        models.Q(difficulty__icontains=query)
+    )
+
+
+def db_routes(search_query):
+    """Маршруты из БД с фильтром поиска списка (routes_list и JSON API)"""
+    routes = TouristRoute.objects.filter(source='db')
+    if search_query:
+        routes = routes.filter(
+            models.Q(name__icontains=search_query) |
+            models.Q(description__icontains=search_query) |
+            models.Q(region__icontains=search_query) |
+            models.Q(best_season__icontains=search_query)
+        )
+    return routes
+
+
+def search_routes(query, queryset=None, limit=SEARCH_RESULTS_LIMIT):
+    """Поиск маршрутов из БД
+
+    На PostgreSQL - полнотекстовый поиск по search_vector (GIN индекс) с
+    сортировкой по ts_rank; на остальных базах - прежний icontains по
+    текстовым полям.
+    """
+    if queryset is None:
+        queryset = TouristRoute.objects.filter(source='db')
+
+    if connection.vendor == 'postgresql':
+        search_query = _prefix_search_query(query)
+        if search_query is not None:
+            return (queryset
+                    .filter(search_vector=search_query)
+                    .annotate(rank=SearchRank(models.F('search_vector'), search_query))
+                    .order_by('-rank', '-created_at')[:limit])
+
+    return queryset.filter(_icontains_filter(query))[:limit]
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .caching import bump_data_version
+from .models import TouristRoute
+from .statistics import apply_route_change, route_values, stored_route_values
+
+
+@receiver(post_save, sender=TouristRoute)
+@receiver(post_delete, sender=TouristRoute)
+def route_changed(sender, **kwargs):
+    """Любое изменение маршрута в БД сбрасывает кэш поиска
+
+    Версия меняется после коммита: иначе параллельный запрос успел бы
+    закэшировать старые данные уже под новой версией.
+    """
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(pre_save, sender=TouristRoute)
+@receiver(pre_delete, sender=TouristRoute)
+def remember_route_statistics(sender, instance, **kwargs):
+    """Запоминает прежние значения маршрута, чтобы вычесть их из сводки
+
+    Загрузка фикстур (loaddata, raw=True) сводку не трогает: она
+    загружается вместе с маршрутами или пересчитывается после загрузки.
+    """
+    if kwargs.get('raw'):
+        return
+    instance._statistics_old = stored_route_values(instance)
+
+
+@receiver(post_save, sender=TouristRoute)
+def route_statistics_saved(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    old = getattr(instance, '_statistics_old', None)
+    new = route_values(instance)
+    if old != new:
+        apply_route_change(old, -1)
+        apply_route_change(new, 1)
+
+
+@receiver(post_delete, sender=TouristRoute)
+def route_statistics_deleted(sender, instance, **kwargs):
+    apply_route_change(getattr(instance, '_statistics_old', None), -1)
@@ -0,0 +1,13 @@
+// Новая строка - копия последней с пустыми полями и следующим номером
+document.getElementById('add-row').addEventListener('click', function() {
+    const total = document.getElementById('total-forms');
+    const rows = document.querySelectorAll('#batch-routes .batch-row');
+    const index = parseInt(total.value, 10);
+    const row = rows[rows.length - 1].cloneNode(true);
+    row.querySelectorAll('input, select, textarea').forEach(function(field) {
+        field.name = field.name.replace(/^routes-\d+-/, 'routes-' + index + '-');
+        field.value = '';
+    });
+    document.querySelector('#batch-routes tbody').appendChild(row);
+    total.value = index + 1;
+});
@@ -0,0 +1,109 @@
+// Адреса представлений передаются из шаблона в data-атрибутах поля поиска
+const searchInput = document.getElementById('ajax-search');
+let searchTimeout;
+
+searchInput.addEventListener('input', function() {
+    const query = this.value.trim();
+    const statusElement = document.getElementById('search-status');
+    const resultsContainer = document.getElementById('search-results');
+    const ajaxResults = document.getElementById('ajax-results');
+    
+    // Очищаем предыдущий таймер
+    clearTimeout(searchTimeout);
+    
+    if (query.length === 0) {
+        statusElement.textContent = '';
+        ajaxResults.style.display = 'none';
+        return;
+    }
+    
+    if (query.length < 2) {
+        statusElement.textContent = 'Введите минимум 2 символа';
+        ajaxResults.style.display = 'none';
+        return;
+    }
+    
+    statusElement.textContent = '⌛ Поиск...';
+    ajaxResults.style.display = 'block';
+    resultsContainer.innerHTML = '<div style="padding: 20px; text-align: center; color: #666;">⌛ Поиск...</div>';
+    
+    // Задержка перед отправкой запроса (дебаунс)
+    searchTimeout = setTimeout(() => {
+        fetch(`${searchInput.dataset.searchUrl}?q=${encodeURIComponent(query)}`, {
+            headers: {
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (data.error) {
+                statusElement.textContent = '❌ Ошибка поиска';
+                resultsContainer.innerHTML = `<div style="padding: 20px; text-align: center; color: #dc3545;">Ошибка: ${data.error}</div>`;
+                return;
+            }
+            
+            statusElement.textContent = `✅ Найдено: ${data.count} маршрутов`;
+            
+            if (data.results.length > 0) {
+                resultsContainer.innerHTML = data.results.map(route => `
+                    <div style="padding: 15px; border-bottom: 1px solid #eee; cursor: pointer; transition: background 0.2s;" 
+                         onmouseover="this.style.background='#f8f9fa'" 
+                         onmouseout="this.style.background='white'"
+                         onclick="window.location.href='${searchInput.dataset.routesUrl}?source=db&search=${encodeURIComponent(route.name)}'">
+                        <div style="display: flex; justify-content: between; align-items: start;">
+                            <div style="flex: 1;">
+                                <strong style="color: #007bff; font-size: 16px;">${route.name}</strong>
+                                <div style="color: #28a745; font-size: 14px; margin-top: 5px;">📍 ${route.region}</div>
+                                <div style="color: #666; font-size: 13px; margin-top: 5px;">${route.description}</div>
+                                <div style="margin-top: 8px; font-size: 12px; color: #888;">
+                                    📏 ${route.length_km} км | ⏱️ ${route.duration_days} дней | 🏔️ ${route.difficulty} | 🌤️ ${route.best_season}
+                                </div>
+                            </div>
+                            <div style="margin-left: 15px;">
+                                <a href="${searchInput.dataset.editUrl.replace('/0/', `/${route.id}/`)}"
+                                   style="color: #007bff; text-decoration: none; font-size: 12px;">✏️</a>
+                            </div>
+                        </div>
+                    </div>
+                `).join('');
+            } else {
+                resultsContainer.innerHTML = `
+                    <div style="padding: 30px; text-align: center; color: #666;">
+                        <div style="font-size: 48px; margin-bottom: 10px;">🔍</div>
+                        <h4>Ничего не найдено</h4>
+                        <p>Попробуйте изменить запрос</p>
+                    </div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            statusElement.textContent = '❌ Ошибка соединения';
+            resultsContainer.innerHTML = '<div style="padding: 20px; text-align: center; color: #dc3545;">Ошибка соединения с сервером</div>';
+        });
+    }, 300); // Задержка 300ms
+});
+
+// Скрываем результаты при клике вне поиска
+document.addEventListener('click', function(e) {
+    if (!e.target.closest('#ajax-search') && !e.target.closest('#ajax-results')) {
+        document.getElementById('ajax-results').style.display = 'none';
+        document.getElementById('search-status').textContent = '';
+    }
+});
+
+// Фокус на поле поиска при нажатии Ctrl+K
+document.addEventListener('keydown', function(e) {
+    if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
+        e.preventDefault();
+        searchInput.focus();
+    }
+});
+
+// Подсказка про горячую клавишу
+searchInput.placeholder = "Начните вводить название, регион, описание... ";
@@ -0,0 +1,135 @@
+from decimal import Decimal
+from django.db import connection, models, transaction
+from .models import RouteStatistic, TouristRoute
+
+# поле сводки -> [нижняя граница, верхняя граница) количества человек
+GROUP_SIZE_BUCKETS = (
+    ('group_size_1_4', None, Decimal('5')),
+    ('group_size_5_9', Decimal('5'), Decimal('10')),
+    ('group_size_10_19', Decimal('10'), Decimal('20')),
+    ('group_size_20_plus', Decimal('20'), None),
+)
+GROUP_SIZE_FIELDS = ('group_size_unknown',) + tuple(field for field, _, _ in GROUP_SIZE_BUCKETS)
+SUMMARY_FIELDS = ('routes_count', 'total_length_km', 'total_duration_days') + GROUP_SIZE_FIELDS
+
+# Поля маршрута, от которых зависит сводка
+_ROUTE_FIELDS = ('source', 'region', 'difficulty', 'length_km', 'duration_days', 'kolvo_chel')
+
+_CENT = Decimal('0.01')
+
+
+def _group_size_field(kolvo_chel):
+    if kolvo_chel is None:
+        return 'group_size_unknown'
+    for field, lower, upper in GROUP_SIZE_BUCKETS:
+        if (lower is None or kolvo_chel >= lower) and (upper is None or kolvo_chel < upper):
+            return field
+
+
+def _decimal(value):
+    # Представления присваивают float - приводим к значению, как оно хранится в БД
+    return None if value is None else Decimal(str(value)).quantize(_CENT)
+
+
+def stored_route_values(route):
+    """Поля сводки маршрута в том виде, в каком они сейчас записаны в БД"""
+    if route.pk is None or route._state.adding:
+        return None
+    return type(route)._base_manager.filter(pk=route.pk).values(*_ROUTE_FIELDS).first()
+
+
+def route_values(route):
+    """Поля сводки сохраненного экземпляра маршрута"""
+    values = {field: getattr(route, field) for field in _ROUTE_FIELDS}
+    values['length_km'] = _decimal(values['length_km'])
+    values['kolvo_chel'] = _decimal(values['kolvo_chel'])
+    values['duration_days'] = int(values['duration_days'])
+    return values
+
+
+def apply_route_changes(changes):
+    """Применяет к сводке пары (значения маршрута, +1 или -1)
+
+    Изменения суммируются по группам, и каждая группа обновляется одним
+    UPDATE через F(), так что параллельные изменения не теряются. Строка
+    группы создается при первом маршруте.
+    """
+    group_deltas = {}
+    for values, sign in changes:
+        if values is None or values['source'] != 'db':
+            continue
+        deltas = group_deltas.setdefault((values['region'], values['difficulty']), {})
+        bucket = _group_size_field(_decimal(values['kolvo_chel']))
+        for field, delta in (('routes_count', sign),
+                             ('total_length_km', sign * _decimal(values['length_km'])),
+                             ('total_duration_days', sign * int(values['duration_days'])),
+                             (bucket, sign)):
+            deltas[field] = deltas.get(field, 0) + delta
+
+    for (region, difficulty), deltas in group_deltas.items():
+        group = {'region': region, 'difficulty': difficulty}
+        updates = {field: models.F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            continue
+        if not RouteStatistic.objects.filter(**group).update(**updates):
+            RouteStatistic.objects.bulk_create([RouteStatistic(**group)], ignore_conflicts=True)
+            RouteStatistic.objects.filter(**group).update(**updates)
+
+
+def apply_route_change(values, sign):
+    """Добавляет (sign=1) или вычитает (sign=-1) один маршрут из сводки"""
+    apply_route_changes([(values, sign)])
+
+
+def rebuild_route_statistics():
+    """Полный пересчет сводки одним GROUP BY; возвращает число групп"""
+    aggregates = {
+        'routes_count': models.Count('id'),
+        'total_length_km': models.Sum('length_km', default=0),
+        'total_duration_days': models.Sum('duration_days', default=0),
+        'group_size_unknown': models.Count('id', filter=models.Q(kolvo_chel__isnull=True)),
+    }
+    for field, lower, upper in GROUP_SIZE_BUCKETS:
+        condition = models.Q(kolvo_chel__isnull=False)
+        if lower is not None:
+            condition &= models.Q(kolvo_chel__gte=lower)
+        if upper is not None:
+            condition &= models.Q(kolvo_chel__lt=upper)
+        aggregates[field] = models.Count('id', filter=condition)
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Изменения маршрутов ждут конца пересчета, а не применяются к удаляемым строкам
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {RouteStatistic._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        rows = (TouristRoute.objects.filter(source='db')
+                .values('region', 'difficulty').annotate(**aggregates).order_by())
+        statistics = [RouteStatistic(**row) for row in rows]
+        RouteStatistic.objects.all().delete()
+        RouteStatistic.objects.bulk_create(statistics, batch_size=1000)
+    return len(statistics)
+
+
+def get_route_statistics():
+    """Строки сводки по группам и итоговая строка; O(число групп)"""
+    rows = list(RouteStatistic.objects.filter(routes_count__gt=0).order_by('region', 'difficulty'))
+    totals = RouteStatistic(region='', difficulty='')
+    for row in rows:
+        for field in SUMMARY_FIELDS:
+            setattr(totals, field, getattr(totals, field) + getattr(row, field))
+    return rows, totals
+
+
+def statistic_to_dict(statistic):
+    avg_length_km = statistic.avg_length_km
+    avg_duration_days = statistic.avg_duration_days
+    return {
+        'region': statistic.region,
+        'difficulty': statistic.difficulty,
+        'routes_count': statistic.routes_count,
+        'total_length_km': str(statistic.total_length_km),
+        'avg_length_km': str(avg_length_km.quantize(_CENT)) if avg_length_km is not None else None,
+        'total_duration_days': statistic.total_duration_days,
+        'avg_duration_days': round(avg_duration_days, 2) if avg_duration_days is not None else None,
+        'group_sizes': {field: getattr(statistic, field) for field in GROUP_SIZE_FIELDS},
+    }
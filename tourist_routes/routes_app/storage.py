@@ -0,0 +1,84 @@
+import gzip
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from whitenoise.storage import CompressedManifestStaticFilesStorage
+except ImportError:
+    CompressedManifestStaticFilesStorage = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.xml', '.json', '.html', '.map')
+# Маленькие файлы не сжимаются: выигрыш меньше накладных расходов
+COMPRESS_MIN_SIZE = 256
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, mode=brotli.MODE_TEXT)
+
+
+class _UnhashedFallbackMixin:
+    """Исходное имя для файла без записи в манифесте - только при DEBUG и в тестах
+
+    Без записи collectstatic не запускался; в остальных случаях это ошибка
+    развертывания, и ValueError пробрасывается.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if not (settings.DEBUG or getattr(settings, 'IS_TESTING', False)):
+                raise
+            return name
+
+
+class LocalCompressedManifestStorage(_UnhashedFallbackMixin, ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени и заранее сжатыми копиями (без WhiteNoise)
+
+    collectstatic пишет для каждого файла с хэшем .gz (и .br, если
+    установлен brotli) рядом с ним - nginx (gzip_static) их отдает без
+    сжатия на лету. Используется, только если WhiteNoise не установлен.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            yield from self._compress(hashed_name)
+
+    def _compress(self, name):
+        if not name.endswith(COMPRESS_EXTENSIONS):
+            return
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            # Несжимаемые файлы не получают копию
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            yield name, name + suffix, True
+
+
+if CompressedManifestStaticFilesStorage is not None:
+    class CompressedManifestStorage(_UnhashedFallbackMixin, CompressedManifestStaticFilesStorage):
+        """Хранилище статики WhiteNoise: хэш содержимого в имени, копии .gz и .br
+
+        Имя меняется вместе с содержимым, поэтому файлы можно кэшировать
+        навсегда (Cache-Control: immutable).
+        """
+else:
+    CompressedManifestStorage = LocalCompressedManifestStorage
@@ -1,3 +1,916 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+from . import api, async_views, batch, caching, exporters, metrics, urls, warmup, xml_snapshot, xml_store
+from .generator import generate_route_data, generate_routes_to_db, iter_routes_xml
+from .importer import import_routes_from_xml
+from .models import RouteStatistic, TouristRoute
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .statistics import SUMMARY_FIELDS, rebuild_route_statistics
+from .storage import (
+    CompressedManifestStaticFilesStorage, CompressedManifestStorage, LocalCompressedManifestStorage, brotli,
+)
+from .xml_index import SEARCH_FIELDS, TrigramIndex
+from .xml_snapshot import RouteSnapshot, SnapshotError, SnapshotWriter
+
+WRITERS = 6
+ROUTES_PER_WRITER = 25
+
+
+def _write_routes(path, writer):
+    for i in range(ROUTES_PER_WRITER):
+        xml_store.save_route_to_xml({
+            'name': f'Маршрут {writer}-{i}',
+            'description': 'Описание',
+            'length_km': 10.0,
+            'duration_days': 2,
+            'difficulty': 'легкий',
+            'region': f'Регион {writer}',
+            'best_season': 'лето',
+            'kolvo_chel': 5.0,
+        }, path)
+
+
+def _read_routes(path, stop, errors):
+    while not stop.is_set():
+        try:
+            ET.parse(path)
+        except ET.ParseError as e:
+            errors.put(str(e))
+
+
+@skipIf(xml_store.fcntl is None, 'нет fcntl')
+class XmlStoreConcurrencyTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+        xml_store.ensure_xml_file_exists(self.path)
+
+    def tearDown(self):
+        xml_store.invalidate_xml_cache(self.path)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parallel_writers_lose_nothing_and_readers_never_see_torn_file(self):
+        ctx = multiprocessing.get_context('fork')
+        stop = ctx.Event()
+        errors = ctx.Queue()
+        readers = [ctx.Process(target=_read_routes, args=(self.path, stop, errors))
+                   for _ in range(2)]
+        writers = [ctx.Process(target=_write_routes, args=(self.path, n))
+                   for n in range(WRITERS)]
+        for process in readers + writers:
+            process.start()
+        for process in writers:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        stop.set()
+        for process in readers:
+            process.join()
+
+        self.assertTrue(errors.empty(), 'читатель увидел недописанный файл')
+        routes = xml_store.get_routes_from_xml(self.path)
+        self.assertEqual(len(routes), WRITERS * ROUTES_PER_WRITER)
+        self.assertEqual(len({(r['name'], r['region']) for r in routes}), len(routes))
+
+    def test_duplicate_is_rejected_across_processes(self):
+        ctx = multiprocessing.get_context('fork')
+        writers = [ctx.Process(target=_write_routes, args=(self.path, 0)) for _ in range(3)]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+
+        self.assertEqual(len(xml_store.get_routes_from_xml(self.path)), ROUTES_PER_WRITER)
+
+
+def _snapshot_route(i):
+    return {field: f'{field} {i} ёжик' if field != 'difficulty' else 'легкий'
+            for field in xml_store.ROUTE_FIELDS}
+
+
+class RouteSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'routes.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, writer, version=(1, 2, 3), name='routes.snapshot'):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            writer.write(f, version)
+        return RouteSnapshot(path, xml_store.ROUTE_FIELDS)
+
+    def test_round_trip(self):
+        routes = [_snapshot_route(i) for i in range(50)] + [dict.fromkeys(xml_store.ROUTE_FIELDS, '')]
+        snapshot = self._write(SnapshotWriter(xml_store.ROUTE_FIELDS).extend(routes), (7, -8, 9))
+        self.assertEqual(snapshot.source_version, (7, -8, 9))
+        self.assertEqual(len(snapshot), len(routes))
+        self.assertEqual(list(snapshot), routes)
+        self.assertEqual(snapshot[-1], routes[-1])
+        self.assertEqual(snapshot[10:13], routes[10:13])
+        with self.assertRaises(IndexError):
+            snapshot[len(routes)]
+
+    def test_round_trip_through_temporary_files(self):
+        routes = [_snapshot_route(i) for i in range(50)]
+        # Таблица и пул уходят во временные файлы почти сразу
+        with mock.patch.object(xml_snapshot, '_SPOOL_MAX_BYTES', 64), \
+                mock.patch.object(xml_snapshot, '_OFFSETS_FLUSH_SIZE', 18):
+            with SnapshotWriter(xml_store.ROUTE_FIELDS, directory=self.tmp_dir) as writer:
+                snapshot = self._write(writer.extend(routes))
+        self.assertEqual(list(snapshot), routes)
+        self.assertEqual(os.listdir(self.tmp_dir), ['routes.snapshot'])
+
+    def test_append_to_base_snapshot(self):
+        base = self._write(SnapshotWriter(xml_store.ROUTE_FIELDS).extend(
+            _snapshot_route(i) for i in range(5)))
+        writer = SnapshotWriter(xml_store.ROUTE_FIELDS, base=base).extend([_snapshot_route(5)])
+        snapshot = self._write(writer, name='appended.snapshot')
+        self.assertEqual(list(snapshot), [_snapshot_route(i) for i in range(6)])
+        self.assertEqual(list(base), [_snapshot_route(i) for i in range(5)])
+
+    def test_truncated_or_foreign_file_is_rejected(self):
+        self._write(SnapshotWriter(xml_store.ROUTE_FIELDS).extend(_snapshot_route(i) for i in range(5)))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for broken in (data[:10], data[:60], b'NOTSNAP!' + data[8:]):
+            with open(self.path, 'wb') as f:
+                f.write(broken)
+            with self.assertRaises(SnapshotError):
+                RouteSnapshot(self.path, xml_store.ROUTE_FIELDS)
+        with self.assertRaises(SnapshotError):
+            RouteSnapshot(self.path, xml_store.ROUTE_FIELDS[:-1])
+
+
+class XmlSnapshotSidecarTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+        xml_store.ensure_xml_file_exists(self.path)
+        _write_routes(self.path, 0)
+
+    def tearDown(self):
+        xml_store.invalidate_xml_cache(self.path)
+        shutil.rmtree(self.tmp_dir)
+
+    def _open_snapshot(self):
+        return xml_store._open_snapshot(self.path, xml_store._file_version(self.path))
+
+    def test_snapshot_follows_appends(self):
+        routes = list(xml_store.get_routes_from_xml(self.path))
+        self.assertEqual(len(self._open_snapshot()), ROUTES_PER_WRITER)
+
+        _write_routes(self.path, 1)
+        snapshot = self._open_snapshot()
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(list(snapshot)[:ROUTES_PER_WRITER], routes)
+        self.assertEqual(len(snapshot), 2 * ROUTES_PER_WRITER)
+
+        # Другой процесс без кэша читает те же маршруты из снимка
+        xml_store.invalidate_xml_cache(self.path)
+        self.assertEqual(list(xml_store.get_routes_from_xml(self.path)), list(snapshot))
+
+    def test_upload_memory_does_not_grow_with_file(self):
+        chunks = list(iter_routes_xml(generate_route_data(40000, seed=3), chunk_size=64 * 1024))
+        size = sum(len(chunk) for chunk in chunks)
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            xml_store.replace_xml_file(iter(chunks), self.path)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, size / 3)
+        self.assertEqual(len(xml_store.get_routes_from_xml(self.path)), 40000)
+        self.assertEqual(len(self._open_snapshot()), 40000)
+
+    def test_stale_snapshot_is_ignored(self):
+        xml_store.get_routes_from_xml(self.path)
+        # Файл изменен в обход xml_store: снимок относится к прежней версии
+        with open(self.path, encoding='utf-8') as f:
+            data = f.read()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(data.replace('</tourist_routes>', (
+                '<route><name>Extra</name><description>d</description><length_km>1</length_km>'
+                '<duration_days>1</duration_days><difficulty>легкий</difficulty><region>R</region>'
+                '</route></tourist_routes>')))
+        self.assertIsNone(self._open_snapshot())
+
+        xml_store.invalidate_xml_cache(self.path)
+        routes = xml_store.get_routes_from_xml(self.path)
+        self.assertEqual(len(routes), ROUTES_PER_WRITER + 1)
+        self.assertEqual(routes[-1]['name'], 'Extra')
+        self.assertEqual(len(self._open_snapshot()), ROUTES_PER_WRITER + 1)
+
+
+class XmlSaveRouteTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+
+    def tearDown(self):
+        xml_store.invalidate_xml_cache(self.path)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_corrupt_file_is_moved_aside(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('<tourist_routes><route>')
+        _write_routes(self.path, 0)
+
+        corrupt = [name for name in os.listdir(self.tmp_dir) if '.corrupt-' in name]
+        self.assertEqual(len(corrupt), 1)
+        with open(os.path.join(self.tmp_dir, corrupt[0]), encoding='utf-8') as f:
+            self.assertEqual(f.read(), '<tourist_routes><route>')
+        routes = xml_store.get_routes_from_xml(self.path)
+        self.assertEqual([route['name'] for route in routes],
+                         [f'Маршрут 0-{i}' for i in range(ROUTES_PER_WRITER)])
+
+
+class XmlUploadTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+        settings_override = override_settings(XML_FILE_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(xml_store.invalidate_xml_cache, self.path)
+        xml_store.ensure_xml_file_exists(self.path)
+        _write_routes(self.path, 0)
+        self.routes = xml_store.get_routes_from_xml(self.path)
+
+    def _files(self):
+        contents = {}
+        for name in sorted(os.listdir(self.tmp_dir)):
+            with open(os.path.join(self.tmp_dir, name), 'rb') as f:
+                contents[name] = f.read()
+        return contents
+
+    def _upload(self, data):
+        return self.client.post(reverse('upload_xml'),
+                                {'xml_file': SimpleUploadedFile('routes.xml', data, 'text/xml')})
+
+    def test_invalid_upload_leaves_file_and_cache(self):
+        valid = b''.join(iter_routes_xml(generate_route_data(50, seed=4)))
+        before = self._files()
+        for broken in (valid[:len(valid) // 2], valid.replace(b'</route>', b'</rout>', 1), b'not xml'):
+            with self.assertRaises(ET.ParseError):
+                xml_store.replace_xml_file(iter([broken[:100], broken[100:]]), self.path)
+            response = self._upload(broken)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Ошибка в XML файле')
+
+            self.assertEqual(self._files(), before)
+            self.assertIs(xml_store.get_routes_from_xml(self.path), self.routes)
+
+    def test_valid_upload_replaces_file(self):
+        response = self._upload(b''.join(iter_routes_xml(generate_route_data(50, seed=4))))
+        self.assertRedirects(response, reverse('routes_list'), fetch_redirect_response=False)
+        self.assertEqual(len(xml_store.get_routes_from_xml(self.path)), 50)
+
+
+def _linear_search(routes, query):
+    query = query.lower()
+    return [position for position, route in enumerate(routes)
+            if any(query in route[field].lower() for field in SEARCH_FIELDS)]
+
+
+class TrigramIndexTests(SimpleTestCase):
+    QUERIES = ['Байкал', 'байКАЛ', 'озер', 'к', 'ле', 'лет', '№17', 'Тропа к Эльбрусу',
+               'км в день', 'нет такого маршрута', 'зз', ' ', 'а а']
+
+    def setUp(self):
+        self.routes = list(generate_route_data(300, seed=7))
+        self.routes.append({**self.routes[0], 'name': 'ЁЛКИ и ёлки', 'best_season': ''})
+
+    def test_results_match_linear_scan(self):
+        index = TrigramIndex(self.routes)
+        for query in self.QUERIES:
+            self.assertEqual(index.search(self.routes, query), _linear_search(self.routes, query), query)
+
+    def test_incremental_add_matches_full_build(self):
+        index = TrigramIndex(self.routes[:100])
+        for route in self.routes[100:]:
+            index.add(route)
+        self.assertEqual(len(index), len(self.routes))
+        for query in self.QUERIES + ['ёлки', 'ЁЛК']:
+            self.assertEqual(index.search(self.routes, query), _linear_search(self.routes, query), query)
+
+
+def _create_db_route(name, **fields):
+    data = {
+        'name': name,
+        'description': 'Описание',
+        'length_km': 10,
+        'duration_days': 2,
+        'difficulty': 'легкий',
+        'region': 'Регион',
+        'best_season': 'лето',
+        'kolvo_chel': 5,
+    }
+    data.update(fields)
+    return TouristRoute.objects.create(**data)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.routes = [_create_db_route(f'Маршрут {i}') for i in range(7)]
+        # Одинаковое время создания у части маршрутов: порядок решает id
+        same_time = timezone.now()
+        TouristRoute.objects.filter(id__in=[r.id for r in self.routes[2:6]]).update(created_at=same_time)
+        self.expected = list(TouristRoute.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _walk(self, per_page):
+        ids = []
+        cursor = None
+        pages = 0
+        while True:
+            page, cursor = keyset_page(TouristRoute.objects.all(), cursor, per_page)
+            ids.extend(route.id for route in page)
+            pages += 1
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_all_routes_once_in_order_with_ties(self):
+        for per_page in (1, 2, 3, 7, 50):
+            ids, pages = self._walk(per_page)
+            self.assertEqual(ids, self.expected)
+            self.assertEqual(pages, max(-(-len(self.expected) // per_page), 1))
+
+    def test_first_and_last_page(self):
+        page, cursor = keyset_page(TouristRoute.objects.all(), None, 3)
+        self.assertEqual([r.id for r in page], self.expected[:3])
+        self.assertEqual(cursor, encode_cursor(page[-1]))
+
+        # Курсор на последний маршрут: следующей страницы нет
+        last = TouristRoute.objects.get(id=self.expected[-2])
+        page, cursor = keyset_page(TouristRoute.objects.all(), encode_cursor(last), 3)
+        self.assertEqual([r.id for r in page], self.expected[-1:])
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip(self):
+        route = TouristRoute.objects.get(id=self.expected[0])
+        self.assertEqual(decode_cursor(encode_cursor(route)), (route.created_at, route.id))
+
+    def test_tampered_cursor_starts_from_first_page(self):
+        for cursor in ('abc', '1-2-3', '-5', 'x-1', '99999999999999999999999-1'):
+            self.assertIsNone(decode_cursor(cursor))
+            page, _ = keyset_page(TouristRoute.objects.all(), cursor, 3)
+            self.assertEqual([r.id for r in page], self.expected[:3])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'search-cache-tests'}})
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        _create_db_route('Телецкое озеро', region='Алтай')
+        _create_db_route('Тропа к перевалу', region='Кавказ')
+
+    def _search(self, query):
+        response = self.client.get(reverse('ajax_search'), {'q': query},
+                                   headers={'x-requested-with': 'XMLHttpRequest'})
+        return sorted(route['name'] for route in response.json()['results'])
+
+    def test_cached_answer_matches_uncached_for_every_casing(self):
+        queries = ['те', 'Те', 'ТЕ', 'тро', 'Тро', 'алтай', 'Алтай']
+        uncached = {}
+        for query in queries:
+            cache.clear()
+            uncached[query] = self._search(query)
+        for order in (queries, queries[::-1]):
+            cache.clear()
+            for query in order:
+                self.assertEqual(self._search(query), uncached[query], query)
+
+
+class AsyncUrls:
+    """URL-ы приложения с async версиями читающих представлений (как при ASYNC_VIEWS=True)"""
+
+    urlpatterns = [
+        path(str(pattern.pattern),
+             getattr(async_views, pattern.name)
+             if pattern.name in ('routes_list', 'ajax_search', 'download_xml') else pattern.callback,
+             name=pattern.name)
+        for pattern in urls.urlpatterns
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        _create_db_route('Телецкое озеро', region='Алтай')
+        _create_db_route('Тропа к перевалу', region='Кавказ')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.xml_path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+        settings_override = override_settings(XML_FILE_PATH=self.xml_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    async def test_routes_list(self):
+        response = await self.async_client.get(reverse('routes_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Телецкое озеро')
+        self.assertContains(response, 'Тропа к перевалу')
+
+    async def test_ajax_search(self):
+        response = await self.async_client.get(reverse('ajax_search'), {'q': 'Телецкое'},
+                                               headers={'x-requested-with': 'XMLHttpRequest'})
+        payload = response.json()
+        self.assertEqual([route['name'] for route in payload['results']], ['Телецкое озеро'])
+        self.assertEqual(payload['query'], 'Телецкое')
+
+    async def test_download_xml_body_matches_length_after_replace(self):
+        original = '<?xml version="1.0"?>\n<tourist_routes>' + '<route/>' * 1000 + '</tourist_routes>\n'
+        with open(self.xml_path, 'w', encoding='utf-8') as f:
+            f.write(original)
+        response = await self.async_client.get(reverse('download_xml'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+
+        # Запись между ответом и чтением тела подменяет файл (os.replace)
+        replacement = os.path.join(self.tmp_dir, 'new.xml')
+        with open(replacement, 'w', encoding='utf-8') as f:
+            f.write('<tourist_routes/>\n')
+        os.replace(replacement, self.xml_path)
+
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, original.encode('utf-8'))
+        self.assertEqual(int(response['Content-Length']), len(body))
+
+    async def test_download_missing_xml_redirects(self):
+        response = await self.async_client.get(reverse('download_xml'))
+        self.assertRedirects(response, reverse('routes_list'), fetch_redirect_response=False)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'data-version-tests'}})
+class DataVersionTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            DATA_VERSION_FILE=os.path.join(self.tmp_dir, 'data_version'))
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bump_in_another_process_changes_version(self):
+        version = caching.get_data_version()
+        self.assertEqual(caching.get_data_version(), version)
+
+        # Другой воркер со своим LocMemCache меняет данные
+        process = multiprocessing.get_context('fork').Process(target=caching.bump_data_version)
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertNotEqual(caching.get_data_version(), version)
+
+
+def _statistics():
+    return {(row.region, row.difficulty): tuple(getattr(row, field) for field in SUMMARY_FIELDS)
+            for row in RouteStatistic.objects.filter(routes_count__gt=0)}
+
+
+class RouteStatisticTests(TestCase):
+    def assertMatchesRebuild(self):
+        incremental = _statistics()
+        rebuild_route_statistics()
+        self.assertEqual(incremental, _statistics())
+
+    def test_incremental_statistics_match_rebuild(self):
+        routes = [
+            _create_db_route('Маршрут 1', region='Алтай', kolvo_chel=3),
+            _create_db_route('Маршрут 2', region='Алтай', kolvo_chel=None, length_km='12.35'),
+            _create_db_route('Маршрут 3', region='Урал', difficulty='сложный', kolvo_chel=25),
+            _create_db_route('Маршрут 4', region='Урал', source='xml'),
+        ]
+        self.assertMatchesRebuild()
+
+        # Смена группы, размера группы и протяженности
+        routes[0].region = 'Урал'
+        routes[0].kolvo_chel = 12
+        routes[0].length_km = 7.5
+        routes[0].save()
+        routes[2].difficulty = 'средний'
+        routes[2].save()
+        routes[3].source = 'db'
+        routes[3].save()
+        self.assertMatchesRebuild()
+
+        routes[1].delete()
+        TouristRoute.objects.filter(region='Урал', difficulty='средний').delete()
+        self.assertMatchesRebuild()
+
+    def test_loaddata_does_not_apply_statistics_twice(self):
+        _create_db_route('Маршрут 1', region='Алтай')
+        _create_db_route('Маршрут 2', region='Урал', difficulty='средний')
+        expected = _statistics()
+        fixture = os.path.join(tempfile.mkdtemp(), 'routes.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(fixture))
+        call_command('dumpdata', 'routes_app', output=fixture, verbosity=0)
+
+        TouristRoute.objects.all().delete()
+        RouteStatistic.objects.all().delete()
+        call_command('loaddata', fixture, verbosity=0)
+        self.assertEqual(_statistics(), expected)
+
+
+def _batch_row(name, **fields):
+    row = {
+        'name': name,
+        'description': 'Описание',
+        'length_km': '10',
+        'duration_days': '2',
+        'difficulty': 'легкий',
+        'region': 'Регион',
+        'best_season': 'лето',
+        'kolvo_chel': '5',
+    }
+    row.update(fields)
+    return row
+
+
+class BatchAddTests(TestCase):
+    def test_too_long_fields_are_reported_per_row(self):
+        results = batch.add_routes([
+            _batch_row('Маршрут 1'),
+            _batch_row('Н' * 201),
+            _batch_row('Маршрут 3', region='Р' * 101),
+            _batch_row('Маршрут 4'),
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid', 'invalid', 'created'])
+        self.assertEqual(len(results[1]['errors']), 1)
+        self.assertEqual(TouristRoute.objects.count(), 2)
+        self.assertEqual(_statistics()[('Регион', 'легкий')][0], 2)
+
+    def test_rows_skipped_by_conflict_are_not_created(self):
+        _create_db_route('Маршрут 1')
+        expected = _statistics()
+        # Маршрут добавлен параллельно после проверки существующих ключей
+        with mock.patch.object(batch, '_existing_keys', return_value={}):
+            results = batch.add_routes([_batch_row('Маршрут 1'), _batch_row('Маршрут 2')])
+
+        self.assertEqual([r['status'] for r in results], ['duplicate', 'created'])
+        summary = batch.batch_summary(results)
+        self.assertEqual((summary['created'], summary['duplicate']), (1, 1))
+        self.assertEqual(_statistics()[('Регион', 'легкий')][0], expected[('Регион', 'легкий')][0] + 1)
+        incremental = _statistics()
+        rebuild_route_statistics()
+        self.assertEqual(incremental, _statistics())
+
+
+class TimedTests(SimpleTestCase):
+    def test_nested_block_of_same_category_is_counted_once(self):
+        timings = metrics.RequestTimings()
+        token = metrics._current.set(timings)
+        try:
+            with metrics.timed('xml'):
+                with metrics.timed('xml'):
+                    time.sleep(0.05)
+                with metrics.timed('db'):
+                    pass
+            with metrics.timed('xml'):
+                pass
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual(timings.counts, {'xml': 2, 'db': 1})
+        self.assertLess(timings.durations['xml'], 0.1)
+        self.assertEqual(timings.running, set())
+
+
+class MetricsFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _write_worker(self, pid, requests):
+        labels = [['view', 'route_list'], ['method', 'GET'], ['status', '200']]
+        metrics._write_state(self.directory, f'metrics-{pid}.json', {
+            'histograms': [['routes_request_duration_seconds', [['view', 'route_list']],
+                            [requests] + [0] * len(metrics.DURATION_BUCKETS), 0.001 * requests, requests]],
+            'counters': [['routes_requests_total', labels, requests]],
+        })
+
+    def _requests_total(self):
+        with mock.patch.object(metrics, 'store', metrics.MetricsStore()):
+            text = metrics.render_metrics(self.directory)
+        return sum(int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                   if line.startswith('routes_requests_total{'))
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        self._write_worker(101, 3)
+        self._write_worker(102, 4)
+        self._write_worker(103, 5)
+        metrics.retire_process_metrics(101, self.directory)
+        metrics.retire_process_metrics(102, self.directory)
+        metrics.retire_process_metrics(104, self.directory)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['metrics-103.json', 'metrics-exited.json'])
+        with open(os.path.join(self.directory, 'metrics-exited.json')) as f:
+            exited = json.load(f)
+        self.assertEqual(exited['counters'][0][2], 7)
+        self.assertEqual(exited['histograms'][0][4], 7)
+        self.assertEqual(self._requests_total(), 12)
+
+    def test_clear_metrics_dir(self):
+        self._write_worker(101, 3)
+        metrics.retire_process_metrics(101, self.directory)
+        self._write_worker(102, 4)
+        open(os.path.join(self.directory, 'other.txt'), 'w').close()
+        metrics.clear_metrics_dir(self.directory)
+        self.assertEqual(os.listdir(self.directory), ['other.txt'])
+        metrics.clear_metrics_dir(os.path.join(self.directory, 'missing'))
+
+
+class GenerateRoutesTests(TestCase):
+    def test_existing_routes_are_not_counted_as_created(self):
+        self.assertEqual(generate_routes_to_db(30, seed=1, batch_size=7), 30)
+        self.assertEqual(generate_routes_to_db(40, seed=1, batch_size=7), 10)
+        self.assertEqual(TouristRoute.objects.count(), 40)
+
+
+class ManifestStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.storage = CompressedManifestStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.storage.location)
+
+    def test_missing_manifest_entry_falls_back_in_tests_and_debug(self):
+        self.assertEqual(self.storage.stored_name('css/site.css'), 'css/site.css')
+        with override_settings(IS_TESTING=False, DEBUG=True):
+            self.assertEqual(self.storage.stored_name('css/site.css'), 'css/site.css')
+
+    def test_missing_manifest_entry_raises_in_production(self):
+        with override_settings(IS_TESTING=False, DEBUG=False):
+            with self.assertRaises(ValueError):
+                self.storage.stored_name('css/site.css')
+
+    def _collect(self, storage_class):
+        """Как collectstatic: копия исходника в хранилище и post_process"""
+        css = ''.join(f'.route-{i} {{ color: #{i:06x}; margin: {i}px; }}\n' for i in range(100)).encode()
+        source = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source.location)
+        source.save('css/site.css', ContentFile(css))
+        storage = storage_class(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, storage.location)
+        storage.save('css/site.css', ContentFile(css))
+        list(storage.post_process({'css/site.css': (source, 'css/site.css')}))
+        return storage, css
+
+    def _assert_compressed_copies(self, storage_class):
+        storage, css = self._collect(storage_class)
+        hashed = storage.stored_name('css/site.css')
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        with storage.open(hashed + '.gz') as f:
+            self.assertEqual(gzip.decompress(f.read()), css)
+        if brotli is not None:
+            with storage.open(hashed + '.br') as f:
+                self.assertEqual(brotli.decompress(f.read()), css)
+
+    def test_post_process_writes_compressed_copies(self):
+        self._assert_compressed_copies(CompressedManifestStorage)
+
+    def test_local_storage_writes_compressed_copies(self):
+        self._assert_compressed_copies(LocalCompressedManifestStorage)
+
+    @skipIf(CompressedManifestStaticFilesStorage is None, 'WhiteNoise не установлен')
+    def test_whitenoise_storage_is_used_when_installed(self):
+        self.assertTrue(issubclass(CompressedManifestStorage,
+                                   CompressedManifestStaticFilesStorage))
+
+
+def _import_xml(routes):
+    fields = ''.join
+    body = ''.join(
+        '<route>' + fields(f'<{field}>{value}</{field}>' for field, value in route.items()) + '</route>'
+        for route in routes)
+    return io.BytesIO(f'<?xml version="1.0" encoding="utf-8"?><tourist_routes>{body}</tourist_routes>'
+                      .encode('utf-8'))
+
+
+class ImportRoutesTests(TestCase):
+    def test_counts_and_invalid_rows(self):
+        _create_db_route('Маршрут 0', length_km=10)
+        incomplete = _batch_row('Маршрут 5')
+        del incomplete['description']
+        routes = [
+            _batch_row('Маршрут 0'),
+            _batch_row('Маршрут 1'),
+            _batch_row('Маршрут 1'),
+            _batch_row('Н' * 201),
+            _batch_row('Маршрут 4', region='Р' * 101),
+            incomplete,
+            _batch_row('Маршрут 6', duration_days='99999999999999999999'),
+            _batch_row('Маршрут 7', length_km='100000'),
+            _batch_row('Маршрут 8'),
+        ]
+        stats = import_routes_from_xml(_import_xml(routes), batch_size=2, chunk_size=3)
+
+        self.assertEqual(stats['processed'], 9)
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(stats['duplicates'], 2)
+        self.assertEqual(stats['invalid'], 5)
+        self.assertEqual(len(stats['errors']), 5)
+        self.assertTrue(stats['errors'][0].startswith('Маршрут #4: '))
+        self.assertEqual(sorted(TouristRoute.objects.values_list('name', flat=True)),
+                         ['Маршрут 0', 'Маршрут 1', 'Маршрут 8'])
+        self.assertEqual(_statistics()[('Регион', 'легкий')][0], 3)
+
+    def test_chunks_report_progress(self):
+        routes = [_batch_row(f'Маршрут {i}') for i in range(10)]
+        progress = []
+        stats = import_routes_from_xml(_import_xml(routes), batch_size=2, chunk_size=4,
+                                       progress=lambda stats: progress.append(stats['inserted']))
+
+        self.assertEqual(progress, [4, 8, 10])
+        self.assertEqual((stats['inserted'], stats['duplicates'], stats['invalid']), (10, 0, 0))
+        self.assertEqual(TouristRoute.objects.count(), 10)
+
+        stats = import_routes_from_xml(_import_xml(routes), chunk_size=4)
+        self.assertEqual((stats['inserted'], stats['duplicates']), (0, 10))
+
+
+class ExportRoutesTests(TestCase):
+    def setUp(self):
+        _create_db_route('Маршрут "Озера" & <пещеры>', region='Алтай, Горный', kolvo_chel=None)
+        _create_db_route('Маршрут 2', description='Строка 1\nСтрока 2', length_km='12.35')
+        _create_db_route('Маршрут 3', difficulty='сложный')
+        _create_db_route('Маршрут из XML', source='xml')
+        self.expected = [
+            {field: exporters._text(value) for field, value in zip(exporters.EXPORT_FIELDS, row)}
+            for row in TouristRoute.objects.filter(source='db').order_by('id')
+            .values_list(*exporters.EXPORT_FIELDS)
+        ]
+
+    def _export(self, export_format, **params):
+        response = self.client.get(reverse('export_routes'), {'format': export_format, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_xml(self):
+        response, body = self._export('xml')
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="tourist_routes_\d{8}\.xml"$')
+        self.assertEqual(list(xml_store.iter_routes_from_xml(io.BytesIO(body))), self.expected)
+
+    def test_csv(self):
+        response, body = self._export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'filename="tourist_routes_\d{8}\.csv"$')
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8'), newline='')))
+        self.assertEqual(rows, self.expected)
+
+    def test_ndjson(self):
+        response, body = self._export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in body.decode('utf-8').splitlines()], self.expected)
+
+    def test_gzip(self):
+        _, plain = self._export('csv')
+        response, body = self._export('csv', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertRegex(response['Content-Disposition'], r'filename="tourist_routes_\d{8}\.csv\.gz"$')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_unknown_format_redirects(self):
+        response = self.client.get(reverse('export_routes'), {'format': 'yaml'})
+        self.assertRedirects(response, reverse('routes_list'), fetch_redirect_response=False)
+        with self.assertRaises(ValueError):
+            exporters.export_routes('yaml')
+
+    def test_small_chunks_stream_the_same_rows(self):
+        chunks = list(exporters.export_routes('ndjson', chunk_size=1, buffer_size=1))
+        self.assertEqual(len(chunks), len(self.expected))
+        self.assertEqual([json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()],
+                         self.expected)
+
+
+class RoutesApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            _create_db_route(f'Маршрут {i}', region='Алтай' if i % 2 else 'Урал')
+
+    def _get(self, **params):
+        return self.client.get(reverse('api_routes'), params)
+
+    def test_etag_round_trip(self):
+        response = self._get(region='Алтай')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(reverse('api_routes'), {'region': 'Алтай'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _create_db_route('Маршрут 5', region='Алтай')
+        response = self.client.get(reverse('api_routes'), {'region': 'Алтай'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_fields_projection(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get(fields='name,region')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(route) for route in response.json()['results']], [{'name', 'region'}] * 5)
+        page_sql = [query['sql'] for query in queries if 'ORDER BY' in query['sql']]
+        self.assertEqual(len(page_sql), 1)
+        for column in ('description', 'length_km', 'duration_days', 'best_season', 'kolvo_chel'):
+            self.assertNotIn(column, page_sql[0])
+
+        self.assertEqual(self._get(fields='name,password').status_code, 400)
+
+    def test_tampered_cursor_returns_first_page(self):
+        first = self._get(limit=2).json()
+        self.assertIsNotNone(first['next_cursor'])
+        for cursor in ('abc', first['next_cursor'] + '-1', '9' * 30 + '-1', "1' OR '1'='1"):
+            response = self._get(limit=2, cursor=cursor)
+            self.assertEqual(response.status_code, 200, cursor)
+            self.assertEqual(response.json(), first, cursor)
+
+    def test_state_key_separates_filter_values(self):
+        _create_db_route('x&region=A', region='Б')
+        factory = RequestFactory()
+        # Простая склейка через & дала бы обеим выборкам строку search=x&region=A&region=&difficulty=
+        first = api._routes_state(factory.get('/', {'search': 'x&region=A'}))
+        second = api._routes_state(factory.get('/', {'search': 'x', 'region': 'A&region='}))
+        self.assertEqual(first[1], 1)
+        self.assertEqual(second[1], 0)
+
+
+class WarmUpTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'tourist_routes.xml')
+        settings_override = override_settings(XML_FILE_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(xml_store.invalidate_xml_cache, self.path)
+        xml_store.ensure_xml_file_exists(self.path)
+        _write_routes(self.path, 0)
+        xml_store.invalidate_xml_cache(self.path)
+        os.unlink(self.path + xml_store.SNAPSHOT_SUFFIX)
+
+        # Состояние прогрева процесса восстанавливается после теста
+        state_patch = mock.patch.dict(warmup._state, ready=False, started=False, warmed_at=None,
+                                      steps={}, error=None)
+        state_patch.start()
+        self.addCleanup(state_patch.stop)
+
+    def test_warm_up_fills_xml_caches_and_sets_ready(self):
+        steps = warmup.warm_up()
+
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(set(steps), {name for name, _ in warmup.WARMUP_STEPS})
+        self.assertEqual(steps['xml'][0], ROUTES_PER_WRITER)
+        self.assertIn(self.path, xml_store._routes_cache)
+        self.assertIn(self.path, xml_store._keys_cache)
+        self.assertIn(self.path, xml_store._search_index_cache)
+        self.assertTrue(os.path.exists(self.path + xml_store.SNAPSHOT_SUFFIX))
+
+    def test_failed_step_leaves_process_not_ready(self):
+        with mock.patch.object(warmup, 'WARMUP_STEPS', [('broken', mock.Mock(side_effect=OSError('диск')))]):
+            with self.assertRaises(OSError):
+                warmup.warm_up()
+        self.assertFalse(warmup.is_ready())
+        self.assertEqual(warmup.warmup_status()['error'], 'OSError: диск')
+
+    def test_readiness_endpoint(self):
+        with mock.patch('routes_app.views.warm_up_in_background') as warm_up_in_background:
+            response = self.client.get(reverse('readiness'))
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['ready'])
+        warm_up_in_background.assert_called_once_with()
+
+        warmup.warm_up()
+        response = self.client.get(reverse('readiness'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ready'])
+        self.assertEqual(response.json()['steps']['xml']['result'], ROUTES_PER_WRITER)
@@ -1,13 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Читающие представления: async версии при ASYNC_VIEWS (запуск под ASGI)
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('add/', views.add_route, name='add_route'),
     path('upload/', views.upload_xml, name='upload_xml'),
-    path('routes/', views.routes_list, name='routes_list'),
-    path('routes/search/', views.ajax_search, name='ajax_search'),
+    path('routes/', read_views.routes_list, name='routes_list'),
+    path('routes/search/', read_views.ajax_search, name='ajax_search'),
+    path('routes/search/stats/', views.ajax_search_stats, name='ajax_search_stats'),
+    path('routes/batch-add/', views.add_routes_batch, name='add_routes_batch'),
+    path('routes/batch-edit/', views.edit_routes_batch, name='edit_routes_batch'),
     path('routes/edit/<int:route_id>/', views.edit_route, name='edit_route'),
     path('routes/delete/<int:route_id>/', views.delete_route, name='delete_route'),
-    path('download/', views.download_xml, name='download_xml'),
-]
\ No newline at end of file
+    path('download/', read_views.download_xml, name='download_xml'),
+    path('export/', views.export_routes, name='export_routes'),
+    path('api/routes/', api.routes_api, name='api_routes'),
+    path('statistics/', views.route_statistics, name='route_statistics'),
+    path('api/statistics/', views.route_statistics_json, name='route_statistics_json'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('ready/', views.readiness, name='readiness'),
+]
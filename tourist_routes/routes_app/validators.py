@@ -0,0 +1,53 @@
+from django.core.exceptions import ValidationError
+from .models import TouristRoute
+
+# Поля, не проверяемые валидаторами модели (заполняются не из формы)
+_UNCHECKED_FIELDS = ('source', 'search_vector')
+
+
+def validate_route_data(data):
+    """Валидация данных маршрута"""
+    errors = []
+    
+    if not data.get('name') or not data['name'].strip():
+        errors.append("Название маршрута обязательно")
+    
+    if not data.get('description') or not data['description'].strip():
+        errors.append("Описание маршрута обязательно")
+    
+    try:
+        length = float(data.get('length_km', 0))
+        if length <= 0:
+            errors.append("Протяженность должна быть положительным числом")
+    except (ValueError, TypeError):
+        errors.append("Протяженность должна быть числом")
+    
+    try:
+        duration = int(data.get('duration_days', 0))
+        if duration <= 0:
+            errors.append("Продолжительность должна быть положительным числом")
+    except (ValueError, TypeError):
+        errors.append("Продолжительность должна быть целым числом")
+    
+    if not data.get('difficulty') or data['difficulty'] not in ['легкий', 'средний', 'сложный']:
+        errors.append("Укажите корректную сложность маршрута")
+    
+    if not data.get('region') or not data['region'].strip():
+        errors.append("Регион обязателен")
+    
+    return errors
+
+
+def validate_route_fields(route):
+    """Ошибки валидаторов полей модели (max_length, choices, диапазон чисел)
+
+    Проверяет уже построенный TouristRoute: без этого слишком длинное
+    название или регион в PostgreSQL вызывает DataError и прерывает всю
+    транзакцию.
+    """
+    try:
+        route.clean_fields(exclude=_UNCHECKED_FIELDS)
+    except ValidationError as error:
+        return [f'{TouristRoute._meta.get_field(field).verbose_name}: {message}'
+                for field, messages in error.message_dict.items() for message in messages]
+    return []
@@ -2,131 +2,33 @@ import os
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db import models, IntegrityError
-from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
 from django.views.decorators.csrf import csrf_exempt
+from .batch import (
+    BATCH_FIELDS, BATCH_MAX_ROUTES, BatchError, add_routes, batch_summary, parse_batch_rows,
+    update_routes,
+)
+from .caching import (
+    cache_routes_page, cache_search, get_cached_routes_page, get_cached_search,
+    get_data_version, normalize_search_query, routes_page_cache_key, search_cache_key,
+    search_cache_stats,
+)
+from .exporters import EXPORT_FORMATS, export_routes as stream_routes
+from .importer import import_routes_from_xml
+from .metrics import render_metrics
 from .models import TouristRoute
-
-XML_FILE_PATH = os.path.join(settings.BASE_DIR, 'media', 'tourist_routes.xml')
-
-def ensure_xml_file_exists():
-    """Создает XML файл если его нет"""
-    os.makedirs(os.path.dirname(XML_FILE_PATH), exist_ok=True)
-    if not os.path.exists(XML_FILE_PATH):
-        root = ET.Element('tourist_routes')
-        root.set('version', '1.0')
-        root.set('created', datetime.now().isoformat())
-        tree = ET.ElementTree(root)
-        tree.write(XML_FILE_PATH, encoding='utf-8', xml_declaration=True)
-
-def save_route_to_xml(route_data):
-    """Сохраняет маршрут в XML файл"""
-    ensure_xml_file_exists()
-    try:
-        tree = ET.parse(XML_FILE_PATH)
-        root = tree.getroot()
-        
-        # Проверка дубликатов в XML
-        for existing_route in root.findall('route'):
-            existing_name = existing_route.find('name')
-            existing_region = existing_route.find('region')
-            if (existing_name is not None and existing_name.text == route_data['name'] and 
-                existing_region is not None and existing_region.text == route_data['region']):
-                return False
-        
-        # Добавляем новый маршрут
-        route_elem = ET.SubElement(root, 'route')
-        
-        # Сохраняем все поля
-        ET.SubElement(route_elem, 'name').text = route_data['name']
-        ET.SubElement(route_elem, 'description').text = route_data['description']
-        ET.SubElement(route_elem, 'length_km').text = str(route_data['length_km'])
-        ET.SubElement(route_elem, 'duration_days').text = str(route_data['duration_days'])
-        ET.SubElement(route_elem, 'difficulty').text = route_data['difficulty']
-        ET.SubElement(route_elem, 'region').text = route_data['region']
-        ET.SubElement(route_elem, 'best_season').text = route_data['best_season']
-        ET.SubElement(route_elem, 'kolvo_chel').text = str(route_data['kolvo_chel'])
-        ET.SubElement(route_elem, 'created_at').text = datetime.now().isoformat()
-        
-        root.set('last_updated', datetime.now().isoformat())
-        tree.write(XML_FILE_PATH, encoding='utf-8', xml_declaration=True)
-        return True
-        
-    except ET.ParseError:
-        ensure_xml_file_exists()
-        return save_route_to_xml(route_data)
-
-def get_routes_from_xml():
-    """Получает маршруты напрямую из XML файла"""
-    ensure_xml_file_exists()
-    try:
-        tree = ET.parse(XML_FILE_PATH)
-        root = tree.getroot()
-        
-        routes = []
-        for route_elem in root.findall('route'):
-            try:
-                route_data = {}
-                
-                # Извлекаем данные из XML
-                fields = ['name', 'description', 'length_km', 'duration_days', 
-                         'difficulty', 'region', 'best_season', 'kolvo_chel', 'created_at']
-                
-                for field in fields:
-                    elem = route_elem.find(field)
-                    if elem is not None and elem.text:
-                        route_data[field] = elem.text
-                    else:
-                        route_data[field] = ''
-                
-                # Проверяем что есть обязательные поля
-                if (route_data['name'] and route_data['description'] and 
-                    route_data['length_km'] and route_data['duration_days'] and
-                    route_data['difficulty'] and route_data['region']):
-                    routes.append(route_data)
-                    
-            except Exception as e:
-                continue
-                
-        return routes
-                    
-    except ET.ParseError:
-        ensure_xml_file_exists()
-        return []
-
-def validate_route_data(data):
-    """Валидация данных маршрута"""
-    errors = []
-    
-    if not data.get('name') or not data['name'].strip():
-        errors.append("Название маршрута обязательно")
-    
-    if not data.get('description') or not data['description'].strip():
-        errors.append("Описание маршрута обязательно")
-    
-    try:
-        length = float(data.get('length_km', 0))
-        if length <= 0:
-            errors.append("Протяженность должна быть положительным числом")
-    except (ValueError, TypeError):
-        errors.append("Протяженность должна быть числом")
-    
-    try:
-        duration = int(data.get('duration_days', 0))
-        if duration <= 0:
-            errors.append("Продолжительность должна быть положительным числом")
-    except (ValueError, TypeError):
-        errors.append("Продолжительность должна быть целым числом")
-    
-    if not data.get('difficulty') or data['difficulty'] not in ['легкий', 'средний', 'сложный']:
-        errors.append("Укажите корректную сложность маршрута")
-    
-    if not data.get('region') or not data['region'].strip():
-        errors.append("Регион обязателен")
-    
-    return errors
+from .pagination import keyset_page, xml_page
+from .search import db_routes, search_routes
+from .statistics import get_route_statistics, statistic_to_dict
+from .validators import validate_route_data
+from .warmup import is_ready, warm_up_in_background, warmup_status
+from .xml_store import (
+    get_routes_from_xml, replace_xml_file, save_route_to_xml, search_routes_in_xml,
+    xml_file_path, xml_file_version,
+)
 
 def index(request):
     return render(request, 'routes_app/index.html')
@@ -209,53 +111,73 @@ def add_route(request):
         'difficulty_choices': TouristRoute.DIFFICULTY_CHOICES
     })
 
-def routes_list(request):
-    source = request.GET.get('source', 'db')
-    search_query = request.GET.get('search', '')
+def _xml_routes_page(search_query, cursor):
+    """Страница маршрутов из XML файла: (маршруты, курсор следующей страницы)"""
+    positions = None
+    if search_query:
+        # Поиск по триграммному индексу
+        xml_routes, positions = search_routes_in_xml(search_query)
+    else:
+        xml_routes = get_routes_from_xml()
     
+    return xml_page(xml_routes, cursor, positions=positions)
+
+def _routes_table_key(source, search_query, cursor):
+    """Ключ кэша таблицы; версия читается до запроса данных"""
+    version = xml_file_version() if source == 'xml' else get_data_version()
+    return routes_page_cache_key(source, search_query, cursor, version)
+
+def _routes_table_context(source, search_query, cursor):
+    context = {
+        'source': source,
+        'search_query': search_query,
+        'cursor': cursor,
+    }
     if source == 'xml':
         # Получаем маршруты напрямую из XML файла
-        xml_routes = get_routes_from_xml()
-        
-        # Применяем поиск если нужно
-        if search_query:
-            xml_routes = [
-                route for route in xml_routes 
-                if (search_query.lower() in route['name'].lower() or 
-                    search_query.lower() in route['description'].lower() or
-                    search_query.lower() in route['region'].lower() or
-                    search_query.lower() in route['best_season'].lower())
-            ]
-        
-        context = {
-            'xml_routes': xml_routes,
-            'source': source,
-            'search_query': search_query,
-        }
-        
+        context['xml_routes'], context['next_cursor'] = _xml_routes_page(search_query, cursor)
     else:
-        # Данные из БД
-        routes = TouristRoute.objects.filter(source='db')
-        
-        # Поиск для БД
-        if search_query:
-            routes = routes.filter(
-                models.Q(name__icontains=search_query) |
-                models.Q(description__icontains=search_query) |
-                models.Q(region__icontains=search_query) |
-                models.Q(best_season__icontains=search_query)
-            )
-        
-        routes = routes.order_by('-created_at')
-        
-        context = {
-            'routes': routes,
-            'source': source,
-            'search_query': search_query,
-        }
+        # Данные из БД, постраничный вывод по ключу (created_at, id)
+        context['routes'], context['next_cursor'] = keyset_page(db_routes(search_query), cursor)
+    return context
+
+# Читающие представления выполняются без транзакции ATOMIC_REQUESTS
+@transaction.non_atomic_requests
+def routes_list(request):
+    source = request.GET.get('source', 'db')
+    search_query = request.GET.get('search', '')
+    cursor = request.GET.get('cursor', '')
+    
+    # Таблица рендерится один раз на версию данных и отдается из кэша
+    cache_key = _routes_table_key(source, search_query, cursor)
+    routes_table = get_cached_routes_page(cache_key)
+    if routes_table is None:
+        routes_table = render_to_string('routes_app/routes_table.html',
+                                        _routes_table_context(source, search_query, cursor))
+        cache_routes_page(cache_key, routes_table)
     
+    context = {
+        'source': source,
+        'search_query': search_query,
+        'routes_table': routes_table,
+    }
     return render(request, 'routes_app/routes_list.html', context)
 
+def _search_result(route):
+    """Маршрут в ответе AJAX поиска"""
+    return {
+        'id': route.id,
+        'name': route.name,
+        'description': route.description[:100] + '...' if len(route.description) > 100 else route.description,
+        'region': route.region,
+        'length_km': str(route.length_km),
+        'duration_days': route.duration_days,
+        'difficulty': route.get_difficulty_display(),
+        'best_season': route.best_season,
+        'kolvo_chel': str(route.kolvo_chel),
+    }
+
+@transaction.non_atomic_requests
 @csrf_exempt
 def ajax_search(request):
     """AJAX поиск по маршрутам из БД"""
@@ -266,40 +188,57 @@ def ajax_search(request):
             return JsonResponse({'results': [], 'message': 'Введите минимум 2 символа'})
         
         try:
-            # Ищем по текстовым полям в БД
-            routes = TouristRoute.objects.filter(source='db').filter(
-                models.Q(name__icontains=query) |
-                models.Q(description__icontains=query) |
-                models.Q(region__icontains=query) |
-                models.Q(best_season__icontains=query) |
-                models.Q(difficulty__icontains=query)
-            )[:15]  # Ограничиваем количество результатов
-            
-            results = []
-            for route in routes:
-                results.append({
-                    'id': route.id,
-                    'name': route.name,
-                    'description': route.description[:100] + '...' if len(route.description) > 100 else route.description,
-                    'region': route.region,
-                    'length_km': str(route.length_km),
-                    'duration_days': route.duration_days,
-                    'difficulty': route.get_difficulty_display(),
-                    'best_season': route.best_season,
-                    'kolvo_chel': str(route.kolvo_chel),
-                })
+            # Одинаковые запросы отдаются из кэша; ищется тот же запрос, что в ключе
+            search_query = normalize_search_query(query)
+            cache_key = search_cache_key(search_query)
+            payload = get_cached_search(cache_key)
+            if payload is None:
+                # Полнотекстовый поиск в БД (icontains вне PostgreSQL)
+                results = [_search_result(route) for route in search_routes(search_query)]
+                
+                payload = {'results': results, 'count': len(results)}
+                cache_search(cache_key, payload)
             
-            return JsonResponse({
-                'results': results,
-                'count': len(results),
-                'query': query
-            })
+            return JsonResponse({**payload, 'query': query})
             
         except Exception as e:
             return JsonResponse({'results': [], 'error': str(e)})
     
     return JsonResponse({'results': [], 'error': 'Invalid request'})
 
+@transaction.non_atomic_requests
+def ajax_search_stats(request):
+    """Счетчики попаданий в кэш AJAX поиска"""
+    return JsonResponse(search_cache_stats())
+
+@transaction.non_atomic_requests
+def route_statistics(request):
+    """Сводка маршрутов по регионам и сложности"""
+    rows, totals = get_route_statistics()
+    return render(request, 'routes_app/statistics.html', {'rows': rows, 'totals': totals})
+
+@transaction.non_atomic_requests
+def route_statistics_json(request):
+    """Сводка маршрутов в JSON"""
+    rows, totals = get_route_statistics()
+    return JsonResponse({
+        'groups': [statistic_to_dict(row) for row in rows],
+        'totals': statistic_to_dict(totals),
+    }, json_dumps_params={'ensure_ascii': False})
+
+@transaction.non_atomic_requests
+def metrics(request):
+    """Метрики производительности всех воркеров в формате Prometheus"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@transaction.non_atomic_requests
+def readiness(request):
+    """Готовность процесса: 200 после прогрева, иначе 503 и прогрев в фоне"""
+    if not is_ready():
+        warm_up_in_background()
+    return JsonResponse(warmup_status(), status=200 if is_ready() else 503)
+
 def edit_route(request, route_id):
     """Редактирование маршрута из БД"""
     route = get_object_or_404(TouristRoute, id=route_id, source='db')
@@ -376,6 +315,79 @@ def delete_route(request, route_id):
     
     return render(request, 'routes_app/confirm_delete.html', {'route': route})
 
+def _batch_form_rows(rows, results=None):
+    """Строки шаблона пакетной формы: данные и ошибки строки"""
+    if results is None:
+        return [{'data': row, 'errors': []} for row in rows]
+    # После отправки форма показывает только строки, которые не удалось сохранить
+    return [{'data': result['data'], 'errors': result['errors']}
+            for result in results if result['errors']]
+
+def _render_batch(request, mode, form_rows):
+    return render(request, 'routes_app/batch_routes.html', {
+        'mode': mode,
+        'form_rows': form_rows,
+        'max_routes': BATCH_MAX_ROUTES,
+        'difficulty_choices': TouristRoute.DIFFICULTY_CHOICES,
+    })
+
+def _batch_response(request, mode, results, saved_status):
+    """JSON сводка для AJAX, иначе сообщения и форма с ошибочными строками"""
+    summary = batch_summary(results)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse(summary, json_dumps_params={'ensure_ascii': False})
+    
+    saved = summary.get(saved_status, 0)
+    failed = len(results) - saved
+    if saved:
+        action = 'добавлено' if mode == 'add' else 'обновлено'
+        messages.success(request, f'Маршрутов {action}: {saved}')
+    if summary.get('duplicate'):
+        messages.warning(request, f'Дубликатов: {summary["duplicate"]}')
+    if not failed:
+        return redirect('routes_list')
+    messages.error(request, f'Не сохранено строк: {failed}')
+    return _render_batch(request, mode, _batch_form_rows(None, results))
+
+def add_routes_batch(request):
+    """Добавление нескольких маршрутов в БД одним запросом"""
+    if request.method == 'POST':
+        try:
+            rows = parse_batch_rows(request.POST)
+        except BatchError as e:
+            messages.error(request, str(e))
+            return _render_batch(request, 'add', _batch_form_rows([{}]))
+        return _batch_response(request, 'add', add_routes(rows), 'created')
+    
+    try:
+        count = min(max(int(request.GET.get('rows', 5)), 1), BATCH_MAX_ROUTES)
+    except ValueError:
+        count = 5
+    blank = {field: '' for field in BATCH_FIELDS}
+    return _render_batch(request, 'add', _batch_form_rows([blank] * count))
+
+def edit_routes_batch(request):
+    """Редактирование нескольких маршрутов БД одним запросом"""
+    if request.method == 'POST':
+        try:
+            rows = parse_batch_rows(request.POST)
+        except BatchError as e:
+            messages.error(request, str(e))
+            return _render_batch(request, 'edit', [])
+        return _batch_response(request, 'edit', update_routes(rows), 'updated')
+    
+    ids = [value for value in request.GET.get('ids', '').split(',') if value.strip().isdigit()]
+    routes = TouristRoute.objects.filter(source='db', id__in=ids[:BATCH_MAX_ROUTES]).order_by('id')
+    rows = []
+    for route in routes:
+        row = {field: getattr(route, field) for field in BATCH_FIELDS}
+        row['id'] = route.id
+        row['kolvo_chel'] = '' if route.kolvo_chel is None else route.kolvo_chel
+        rows.append(row)
+    return _render_batch(request, 'edit', _batch_form_rows(rows))
+
+# Импорт коммитит каждый чанк сам (importer._insert_chunk), а не одной транзакцией запроса
+@transaction.non_atomic_requests
 def upload_xml(request):
     """Загрузка XML файла"""
     if request.method == 'POST' and request.FILES.get('xml_file'):
@@ -386,13 +398,21 @@ def upload_xml(request):
             return redirect('upload_xml')
         
         try:
-            file_content = uploaded_file.read().decode('utf-8')
-            ET.fromstring(file_content)  # Проверяем валидность
+            # Файл пишется блоками и проверяется на валидность по ходу записи
+            replace_xml_file(uploaded_file.chunks())
+            messages.success(request, 'XML файл успешно загружен!')
             
-            with open(XML_FILE_PATH, 'w', encoding='utf-8') as f:
-                f.write(file_content)
+            # Дополнительно переносим маршруты из файла в БД
+            if request.POST.get('import_to_db'):
+                stats = import_routes_from_xml(xml_file_path())
+                messages.success(
+                    request,
+                    f'Импортировано в БД: {stats["inserted"]}, дубликатов: {stats["duplicates"]}, '
+                    f'с ошибками: {stats["invalid"]} ({stats["rows_per_second"]:.0f} строк/с)'
+                )
+                for error in stats['errors']:
+                    messages.warning(request, error)
             
-            messages.success(request, 'XML файл успешно загружен!')
             return redirect('routes_list')
                 
         except ET.ParseError as e:
@@ -402,14 +422,39 @@ def upload_xml(request):
     
     return render(request, 'routes_app/upload_xml.html')
 
+@transaction.non_atomic_requests
 def download_xml(request):
     """Скачивание XML файла"""
-    if not os.path.exists(XML_FILE_PATH):
+    path = xml_file_path()
+    if not os.path.exists(path):
         messages.error(request, 'XML файл не существует')
         return redirect('routes_list')
     
     from django.http import FileResponse
-    response = FileResponse(open(XML_FILE_PATH, 'rb'))
+    response = FileResponse(open(path, 'rb'))
     response['Content-Type'] = 'application/xml'
-    response['Content-Disposition'] = f'attachment; filename="tourist_routes_{datetime.now().strftime("%Y%m%d")}.xml"'
-    return response
\ No newline at end of file
+    response['Content-Disposition'] = _xml_download_disposition()
+    return response
+
+def _xml_download_disposition():
+    return f'attachment; filename="tourist_routes_{datetime.now().strftime("%Y%m%d")}.xml"'
+
+@transaction.non_atomic_requests
+def export_routes(request):
+    """Потоковый экспорт маршрутов из БД в XML, CSV или NDJSON"""
+    export_format = request.GET.get('format', 'xml')
+    if export_format not in EXPORT_FORMATS:
+        messages.error(request, f'Неизвестный формат экспорта: {export_format}')
+        return redirect('routes_list')
+    
+    compress = request.GET.get('gzip') == '1'
+    content_type, extension = EXPORT_FORMATS[export_format]
+    filename = f'tourist_routes_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    if compress:
+        content_type = 'application/gzip'
+        filename += '.gz'
+    
+    response = StreamingHttpResponse(stream_routes(export_format, compress=compress),
+                                     content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
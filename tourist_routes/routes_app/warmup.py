@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from importlib import import_module
+from django.apps import apps
+from django.core.cache import close_caches
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+from .caching import get_data_version
+from .models import TouristRoute
+from .xml_store import preload_xml
+
+# Состояние прогрева процесса. Воркеры gunicorn, запущенные с preload_app,
+# получают его от мастера вместе с прогретыми кэшами (copy-on-write).
+_state = {'ready': False, 'started': False, 'warmed_at': None, 'steps': {}, 'error': None}
+_lock = threading.Lock()
+
+
+def _import_views():
+    """Импортирует модули представлений приложений и заполняет URL resolver"""
+    modules = 0
+    for app_config in apps.get_app_configs():
+        for name in ('views', 'api', 'async_views'):
+            try:
+                import_module(f'{app_config.name}.{name}')
+            except ModuleNotFoundError as error:
+                if error.name != f'{app_config.name}.{name}':
+                    raise
+                continue
+            modules += 1
+    # reverse_dict заполняет URL resolver при первом обращении
+    get_resolver().reverse_dict
+    return modules
+
+
+def _compile_templates():
+    """Компилирует все шаблоны в кэширующий загрузчик"""
+    compiled = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    if not filename.endswith(('.html', '.txt', '.xml')):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename), directory)
+                    try:
+                        engine.get_template(name.replace(os.sep, '/'))
+                    except TemplateSyntaxError:
+                        # Например, шаблон стороннего приложения с недоступной библиотекой тегов
+                        continue
+                    compiled += 1
+    return compiled
+
+
+def _touch_database():
+    """Проверяет соединение с БД и кэшем, заодно заполняя внутренние структуры ORM"""
+    TouristRoute.objects.only('id').first()
+    get_data_version()
+    return connections['default'].vendor
+
+
+WARMUP_STEPS = [
+    ('views', _import_views),
+    ('templates', _compile_templates),
+    ('xml', preload_xml),
+    ('database', _touch_database),
+]
+
+
+def warm_up():
+    """Прогревает процесс: представления, шаблоны, маршруты XML и индекс поиска, БД
+
+    Возвращает словарь шаг -> (результат, секунды). После успешного
+    прогрева процесс считается готовым (см. is_ready).
+    """
+    with _lock:
+        _state['started'] = True
+        steps = {}
+        try:
+            for name, step in WARMUP_STEPS:
+                started = time.perf_counter()
+                result = step()
+                steps[name] = (result, time.perf_counter() - started)
+        except Exception as error:
+            _state['started'] = False
+            _state['error'] = f'{type(error).__name__}: {error}'
+            raise
+        _state.update(ready=True, warmed_at=time.time(), steps=steps, error=None)
+        return steps
+
+
+def warm_up_in_background():
+    """Запускает прогрев в фоновом потоке, если процесс еще не прогрет"""
+    with _lock:
+        if _state['ready'] or _state['started']:
+            return
+        _state['started'] = True
+
+    def run():
+        try:
+            warm_up()
+        except Exception:
+            pass
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='routes-warmup', daemon=True).start()
+
+
+def is_ready():
+    return _state['ready']
+
+
+def warmup_status():
+    return {
+        'ready': _state['ready'],
+        'warmed_at': _state['warmed_at'],
+        'steps': {name: {'result': result, 'seconds': round(seconds, 3)}
+                  for name, (result, seconds) in _state['steps'].items()},
+        'error': _state['error'],
+    }
+
+
+def release_connections():
+    """Закрывает соединения с БД (и пулы) и кэшами перед fork воркеров
+
+    Сокет, унаследованный несколькими процессами, сломал бы протокол;
+    каждый воркер откроет свои соединения при первом запросе.
+    """
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+    close_caches()
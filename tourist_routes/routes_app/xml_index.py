@@ -0,0 +1,73 @@
+from bisect import bisect_left
+
+SEARCH_FIELDS = ('name', 'description', 'region', 'best_season')
+NGRAM_SIZE = 3
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def _matches(route, query):
+    """Подстрока query (уже в нижнем регистре) есть в одном из полей поиска"""
+    return any(query in route[field].lower() for field in SEARCH_FIELDS)
+
+
+def _contains(sorted_positions, position):
+    i = bisect_left(sorted_positions, position)
+    return i < len(sorted_positions) and sorted_positions[i] == position
+
+
+class TrigramIndex:
+    """Инвертированный триграммный индекс по маршрутам из XML
+
+    Для каждой триграммы полей поиска хранится отсортированный список
+    позиций маршрутов. Запрос отвечает пересечением списков его триграмм,
+    а подстрока проверяется только у кандидатов - без прохода по всем
+    маршрутам. Маршруты добавляются только в конец (как и в XML файл).
+    """
+
+    def __init__(self, routes=()):
+        self._postings = {}
+        self._size = 0
+        for route in routes:
+            self.add(route)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, route):
+        """Добавляет маршрут со следующей позицией"""
+        position = self._size
+        ngrams = set()
+        for field in SEARCH_FIELDS:
+            ngrams |= _ngrams(route[field].lower())
+        for ngram in ngrams:
+            self._postings.setdefault(ngram, []).append(position)
+        self._size += 1
+
+    def search(self, routes, query):
+        """Отсортированные позиции маршрутов, содержащих query без учета регистра
+
+        Запросы короче триграммы проверяются полным проходом.
+        """
+        query = query.lower()
+        query_ngrams = _ngrams(query)
+        if not query_ngrams:
+            return [position for position in range(self._size)
+                    if _matches(routes[position], query)]
+
+        postings = []
+        for ngram in query_ngrams:
+            positions = self._postings.get(ngram)
+            if not positions:
+                return []
+            postings.append(positions)
+        postings.sort(key=len)
+
+        candidates = postings[0]
+        for positions in postings[1:]:
+            candidates = [p for p in candidates if _contains(positions, p)]
+            if not candidates:
+                return []
+        return [p for p in candidates if _matches(routes[p], query)]
@@ -0,0 +1,162 @@
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+
+# Двоичный снимок маршрутов XML файла:
+#   заголовок | таблица смещений (на каждое поле маршрута: смещение и длина
+#   строки в пуле, uint32) | пул строк UTF-8 (одинаковые строки хранятся один раз)
+# Файл открывается через mmap, так что процессы сервера делят одни и те же
+# страницы кэша ОС, а маршрут читается без разбора XML.
+SNAPSHOT_MAGIC = b'TRSNAP\x00\x01'
+# magic, число полей, число маршрутов, версия исходного XML (inode, mtime_ns, размер)
+_HEADER = struct.Struct('<8sIIQqQ')
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# Строки не длиннее этого (регион, сложность, числа) хранятся в пуле один раз;
+# уникальные длинные строки (названия, описания) не держат словарь в памяти
+_INTERN_MAX_BYTES = 32
+# Предел словаря коротких строк: уникальные короткие значения (created_at)
+# иначе растили бы его вместе с числом маршрутов
+_INTERN_MAX_ENTRIES = 16384
+# Таблица и пул больше этого уходят из памяти во временные файлы
+_SPOOL_MAX_BYTES = 1024 * 1024
+# Сколько чисел таблицы копится в array перед записью во временный файл
+_OFFSETS_FLUSH_SIZE = 64 * 1024
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+class SnapshotWriter:
+    """Собирает снимок маршрутов в компактном виде и пишет его в файл
+
+    Таблица смещений и пул строк копятся во временных файлах в каталоге
+    directory (небольшие - в памяти), так что память сборщика не растет с
+    размером XML. base - снимок с теми же полями, который копируется как
+    есть (таблица и пул), а новые маршруты добавляются после его маршрутов:
+    дозапись в XML не требует перекодировать весь файл. Временные файлы
+    освобождает close() (или with).
+    """
+
+    def __init__(self, fields, base=None, directory=None):
+        self.fields = tuple(fields)
+        self._base_table = base.table_bytes() if base is not None else b''
+        self._base_pool = base.pool_bytes() if base is not None else b''
+        self._count = len(base) if base is not None else 0
+        self._offsets = array('I')
+        self._table = tempfile.SpooledTemporaryFile(_SPOOL_MAX_BYTES, dir=directory)
+        self._pool = tempfile.SpooledTemporaryFile(_SPOOL_MAX_BYTES, dir=directory)
+        self._pool_size = len(self._base_pool)
+        self._interned = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._table.close()
+        self._pool.close()
+
+    def add(self, route):
+        for field in self.fields:
+            encoded = route[field].encode('utf-8')
+            offset = self._interned.get(encoded)
+            if offset is None:
+                offset = self._pool_size
+                self._pool.write(encoded)
+                self._pool_size += len(encoded)
+                if len(encoded) <= _INTERN_MAX_BYTES and len(self._interned) < _INTERN_MAX_ENTRIES:
+                    self._interned[encoded] = offset
+            self._offsets.append(offset)
+            self._offsets.append(len(encoded))
+        self._count += 1
+        if len(self._offsets) >= _OFFSETS_FLUSH_SIZE:
+            self._flush_offsets()
+
+    def extend(self, routes):
+        for route in routes:
+            self.add(route)
+        return self
+
+    def _flush_offsets(self):
+        if sys.byteorder != 'little':
+            self._offsets.byteswap()
+        self._table.write(self._offsets.tobytes())
+        del self._offsets[:]
+
+    def write(self, file, source_version):
+        if self._pool_size > 0xFFFFFFFF:
+            raise SnapshotError('Снимок не помещается в 32-битные смещения')
+        self._flush_offsets()
+
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, len(self.fields), self._count, *source_version))
+        file.write(self._base_table)
+        self._table.seek(0)
+        shutil.copyfileobj(self._table, file, _COPY_BLOCK_SIZE)
+        file.write(self._base_pool)
+        self._pool.seek(0)
+        shutil.copyfileobj(self._pool, file, _COPY_BLOCK_SIZE)
+
+
+class RouteSnapshot(Sequence):
+    """Маршруты снимка как последовательность словарей, только для чтения
+
+    Строки декодируются из отображенного файла при обращении к маршруту,
+    поэтому открытие снимка не зависит от числа маршрутов.
+    """
+
+    def __init__(self, path, fields):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise SnapshotError('Снимок обрезан')
+        magic, field_count, self._count, *source_version = _HEADER.unpack_from(self._mmap)
+        if magic != SNAPSHOT_MAGIC or field_count != len(fields):
+            raise SnapshotError('Неизвестный формат снимка')
+        self.fields = tuple(fields)
+        self.source_version = tuple(source_version)
+        self._row = struct.Struct('<' + 'II' * field_count)
+        self._table_start = _HEADER.size
+        self._pool_start = self._table_start + self._count * self._row.size
+        if len(self._mmap) < self._pool_start:
+            raise SnapshotError('Снимок обрезан')
+        self._buffer = memoryview(self._mmap)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._route(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('route index out of range')
+        return self._route(index)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._route(index)
+
+    def _route(self, index):
+        entries = self._row.unpack_from(self._buffer, self._table_start + index * self._row.size)
+        pool = self._pool_start
+        buffer = self._buffer
+        return {
+            field: str(buffer[pool + offset:pool + offset + length], 'utf-8')
+            for field, offset, length in zip(self.fields, entries[::2], entries[1::2])
+        }
+
+    def table_bytes(self):
+        return self._buffer[self._table_start:self._pool_start]
+
+    def pool_bytes(self):
+        return self._buffer[self._pool_start:]
@@ -0,0 +1,503 @@
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime
+from django.conf import settings
+from .metrics import timed
+from .xml_index import TrigramIndex
+from .xml_snapshot import RouteSnapshot, SnapshotWriter
+
+try:
+    import fcntl
+except ImportError:
+    # Нет на Windows: блокировка писателей отключается
+    fcntl = None
+
+# Двоичный снимок маршрутов рядом с XML файлом (см. xml_snapshot)
+SNAPSHOT_SUFFIX = '.snapshot'
+
+ROUTE_FIELDS = ['name', 'description', 'length_km', 'duration_days',
+                'difficulty', 'region', 'best_season', 'kolvo_chel', 'created_at']
+
+REQUIRED_FIELDS = ['name', 'description', 'length_km', 'duration_days',
+                   'difficulty', 'region']
+
+_CLOSING_TAG = b'</tourist_routes>'
+_XML_ENCODING_RE = re.compile(rb'<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+_HEAD_SIZE = 256
+_TAIL_SIZE = 4096
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+# Кэш маршрутов процесса: путь -> (ключ версии файла, маршруты - снимок или список)
+_routes_cache = {}
+# Индекс ключей (название, регион) для проверки дубликатов: путь -> (ключ версии, множество)
+_keys_cache = {}
+# Триграммный индекс для поиска: путь -> (ключ версии, TrigramIndex)
+_search_index_cache = {}
+
+
+def xml_file_path():
+    """Путь XML файла маршрутов (settings.XML_FILE_PATH на момент вызова)"""
+    return settings.XML_FILE_PATH
+
+
+def _stat_version(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _file_version(path):
+    """Ключ версии файла: inode, время изменения и размер"""
+    return _stat_version(os.stat(path))
+
+
+def _fd_version(fd):
+    return _stat_version(os.fstat(fd))
+
+
+def xml_file_version(path=None):
+    """Версия XML файла для ключей кэша ответов
+
+    Каждая запись заменяет файл или меняет его размер, поэтому версия
+    меняется при любой записи, в том числе из другого процесса.
+    """
+    if path is None:
+        path = xml_file_path()
+    try:
+        return '-'.join(str(part) for part in _file_version(path))
+    except FileNotFoundError:
+        return 'missing'
+
+
+def _open_snapshot(path, version):
+    """Снимок маршрутов для версии XML файла или None (нет, устарел, поврежден)"""
+    try:
+        snapshot = RouteSnapshot(path + SNAPSHOT_SUFFIX, ROUTE_FIELDS)
+    except (OSError, ValueError):
+        return None
+    return snapshot if snapshot.source_version == version else None
+
+
+def _write_snapshot(path, writer, version):
+    """Пишет собранный SnapshotWriter как снимок версии XML файла и открывает его
+
+    Снимок - только ускорение: если записать его не удалось (например,
+    каталог только для чтения), возвращается None.
+    """
+    try:
+        with _atomic_write(path + SNAPSHOT_SUFFIX) as tmp_file:
+            writer.write(tmp_file, version)
+    except (OSError, ValueError):
+        return None
+    return _open_snapshot(path, version)
+
+
+def invalidate_xml_cache(path=None):
+    """Сбрасывает кэш маршрутов (для одного файла или для всех)"""
+    if path is None:
+        _routes_cache.clear()
+        _keys_cache.clear()
+        _search_index_cache.clear()
+    else:
+        _routes_cache.pop(path, None)
+        _keys_cache.pop(path, None)
+        _search_index_cache.pop(path, None)
+
+
+@contextmanager
+def _writer_lock(path):
+    """Эксклюзивная блокировка писателей XML файла (между процессами)"""
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _atomic_write(path, lock=False):
+    """Пишет во временный файл рядом с path и атомарно подменяет его
+
+    Читатели, уже открывшие старый файл, дочитывают его целиком, новые -
+    сразу видят новую версию; недописанный файл они не видят никогда.
+    lock=True берет блокировку писателей только на время подмены - для
+    долгих записей, которые не зависят от текущего содержимого файла.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix='.' + os.path.basename(path) + '.',
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            yield tmp_file
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.chmod(tmp_path, 0o644)
+        if lock:
+            with _writer_lock(path):
+                os.replace(tmp_path, path)
+                invalidate_xml_cache(path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def ensure_xml_file_exists(path=None):
+    """Создает XML файл если его нет"""
+    if path is None:
+        path = xml_file_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        return
+
+    with _writer_lock(path):
+        if os.path.exists(path):
+            return
+        _write_empty_xml(path)
+
+
+def _write_empty_xml(path):
+    """Пишет XML файл с пустым корнем (под блокировкой писателей)"""
+    root = ET.Element('tourist_routes')
+    root.set('version', '1.0')
+    root.set('created', datetime.now().isoformat())
+    # Явный закрывающий тег нужен для дозаписи маршрутов
+    root.text = '\n'
+    tree = ET.ElementTree(root)
+    with _atomic_write(path) as tmp_file:
+        tree.write(tmp_file, encoding='utf-8', xml_declaration=True)
+    invalidate_xml_cache(path)
+
+
+def _move_aside_corrupt(path):
+    """Переименовывает поврежденный XML файл в <path>.corrupt-<время>; возвращает новое имя"""
+    corrupt_path = f'{path}.corrupt-{datetime.now():%Y%m%d-%H%M%S-%f}'
+    os.replace(path, corrupt_path)
+    invalidate_xml_cache(path)
+    return corrupt_path
+
+
+def _drain_events(parser, state):
+    """Разбирает накопленные события, удаляя из дерева обработанные элементы
+
+    Полные маршруты добавляются в снимок state['snapshot'].
+    """
+    for event, elem in parser.read_events():
+        if event == 'start':
+            if state['root'] is None:
+                state['root'] = elem
+            state['depth'] += 1
+        else:
+            state['depth'] -= 1
+            if state['depth'] == 1:
+                if elem.tag == 'route':
+                    route_data = _route_from_element(elem)
+                    if is_complete_route(route_data):
+                        state['snapshot'].add(route_data)
+                state['root'].clear()
+
+
+@timed('xml')
+def replace_xml_file(chunks, path=None):
+    """Атомарно заменяет XML файл содержимым из итератора байтовых блоков
+
+    Блоки пишутся во временный файл и сразу же проверяются инкрементальным
+    парсером. Некорректный XML вызывает ET.ParseError, текущий файл при этом
+    не меняется. Разобранные маршруты удаляются из дерева, а таблица и пул
+    снимка копятся во временных файлах рядом с XML, поэтому память не
+    растет с размером загрузки. Снимок пишется до подмены: os.replace
+    сохраняет inode, время изменения и размер, так что версия временного
+    файла совпадет с версией нового XML.
+    """
+    if path is None:
+        path = xml_file_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    with SnapshotWriter(ROUTE_FIELDS, directory=os.path.dirname(path)) as writer:
+        state = {'root': None, 'depth': 0, 'snapshot': writer}
+        with _atomic_write(path, lock=True) as tmp_file:
+            for chunk in chunks:
+                tmp_file.write(chunk)
+                parser.feed(chunk)
+                _drain_events(parser, state)
+            parser.close()
+            _drain_events(parser, state)
+            tmp_file.flush()
+            _write_snapshot(path, writer, _fd_version(tmp_file.fileno()))
+
+
+def _build_route_element(route_data):
+    """Собирает элемент <route> из данных маршрута"""
+    route_elem = ET.Element('route')
+
+    # Сохраняем все поля
+    ET.SubElement(route_elem, 'name').text = route_data['name']
+    ET.SubElement(route_elem, 'description').text = route_data['description']
+    ET.SubElement(route_elem, 'length_km').text = str(route_data['length_km'])
+    ET.SubElement(route_elem, 'duration_days').text = str(route_data['duration_days'])
+    ET.SubElement(route_elem, 'difficulty').text = route_data['difficulty']
+    ET.SubElement(route_elem, 'region').text = route_data['region']
+    ET.SubElement(route_elem, 'best_season').text = route_data['best_season']
+    ET.SubElement(route_elem, 'kolvo_chel').text = str(route_data['kolvo_chel'])
+    ET.SubElement(route_elem, 'created_at').text = datetime.now().isoformat()
+    return route_elem
+
+
+def _append_route(path, route_elem):
+    """Дописывает <route> перед закрывающим тегом корня
+
+    Файл не разбирается: префикс до закрывающего тега копируется как есть
+    во временный файл, за ним пишется новый маршрут, после чего копия
+    атомарно подменяет оригинал. Копирование - это O(размер файла) ввода-
+    вывода на каждую дозапись (для 100 тыс. маршрутов - десятки МБ), зато
+    читатели никогда не видят недописанный файл. Возвращает False, если
+    файл так дополнить нельзя (корень без закрывающего тега, не UTF-8
+    кодировка) - тогда нужна полная перезапись.
+    """
+    fragment = ET.tostring(route_elem, encoding='unicode').encode('utf-8')
+    with open(path, 'rb') as src:
+        declaration = _XML_ENCODING_RE.search(src.read(_HEAD_SIZE))
+        if declaration and declaration.group(1).lower() not in (b'utf-8', b'utf8'):
+            return False
+
+        size = src.seek(0, os.SEEK_END)
+        tail_start = max(0, size - _TAIL_SIZE)
+        src.seek(tail_start)
+        tail = src.read()
+        pos = tail.rfind(_CLOSING_TAG)
+        if pos == -1 or tail[pos + len(_CLOSING_TAG):].strip():
+            return False
+
+        src.seek(0)
+        with _atomic_write(path) as tmp_file:
+            remaining = tail_start + pos
+            while remaining:
+                block = src.read(min(remaining, _COPY_BLOCK_SIZE))
+                tmp_file.write(block)
+                remaining -= len(block)
+            tmp_file.write(fragment + _CLOSING_TAG + b'\n')
+    return True
+
+
+def _rewrite_with_route(path, route_elem):
+    """Добавляет <route> полной перезаписью файла"""
+    tree = ET.parse(path)
+    root = tree.getroot()
+    root.append(route_elem)
+    root.set('last_updated', datetime.now().isoformat())
+    with _atomic_write(path) as tmp_file:
+        tree.write(tmp_file, encoding='utf-8', xml_declaration=True)
+
+
+def _route_keys(path):
+    """Индекс ключей (название, регион) для проверки дубликатов"""
+    version = _file_version(path)
+    cached = _keys_cache.get(path)
+    if cached is not None and cached[0] == version:
+        return version, cached[1]
+
+    keys = {(route['name'], route['region']) for route in iter_routes_from_xml(path)}
+    _keys_cache[path] = (version, keys)
+    return version, keys
+
+
+def _remember_appended_route(path, old_version, route_elem):
+    """Обновляет кэши и снимок после дозаписи, не перечитывая файл"""
+    new_version = _file_version(path)
+    route_data = _route_from_element(route_elem)
+
+    cached_keys = _keys_cache.get(path)
+    if cached_keys is not None and cached_keys[0] == old_version:
+        cached_keys[1].add((route_data['name'], route_data['region']))
+        _keys_cache[path] = (new_version, cached_keys[1])
+
+    cached_routes = _routes_cache.get(path)
+    if cached_routes is not None and cached_routes[0] == old_version:
+        old_routes = cached_routes[1]
+    else:
+        old_routes = _open_snapshot(path, old_version)
+    if old_routes is None:
+        # Предыдущей версии нет ни в памяти, ни в снимке - полный разбор
+        get_routes_from_xml(path)
+        return
+
+    new_routes = [route_data] if is_complete_route(route_data) else []
+    directory = os.path.dirname(path)
+    if isinstance(old_routes, RouteSnapshot):
+        # Таблица и пул старого снимка копируются без декодирования
+        writer = SnapshotWriter(ROUTE_FIELDS, base=old_routes, directory=directory).extend(new_routes)
+    else:
+        writer = SnapshotWriter(ROUTE_FIELDS, directory=directory).extend(old_routes + new_routes)
+    with writer:
+        routes = _write_snapshot(path, writer, new_version)
+    if routes is None:
+        routes = list(old_routes) + new_routes
+    _routes_cache[path] = (new_version, routes)
+
+    cached_index = _search_index_cache.get(path)
+    if cached_index is not None and cached_index[0] == old_version:
+        for route in new_routes:
+            cached_index[1].add(route)
+        _search_index_cache[path] = (new_version, cached_index[1])
+
+
+def save_route_to_xml(route_data, path=None):
+    """Сохраняет маршрут в XML файл
+
+    Новый <route> дописывается перед закрывающим тегом корня без разбора
+    файла (но с копированием его во временный файл, см. _append_route).
+    Дубликаты ищутся по индексу ключей (название, регион), который
+    строится один раз на версию файла. Писатели из разных процессов
+    выстраиваются в очередь на блокировке файла. Поврежденный XML файл
+    переименовывается в <path>.corrupt-<время>, и маршрут пишется в новый.
+    """
+    if path is None:
+        path = xml_file_path()
+    ensure_xml_file_exists(path)
+    with timed('xml'), _writer_lock(path):
+        try:
+            return _save_route_locked(route_data, path)
+        except ET.ParseError:
+            _move_aside_corrupt(path)
+            _write_empty_xml(path)
+            return _save_route_locked(route_data, path)
+
+
+def _save_route_locked(route_data, path):
+    # Проверка дубликатов в XML
+    version, keys = _route_keys(path)
+    if (route_data['name'], route_data['region']) in keys:
+        return False
+
+    # Добавляем новый маршрут
+    route_elem = _build_route_element(route_data)
+    if _append_route(path, route_elem):
+        _remember_appended_route(path, version, route_elem)
+    else:
+        _rewrite_with_route(path, route_elem)
+        invalidate_xml_cache(path)
+        get_routes_from_xml(path)
+    return True
+
+
+def iter_routes_from_xml(source=None):
+    """Потоково читает маршруты из XML (путь или файловый объект)
+
+    Дерево целиком не строится: каждый обработанный <route> сразу
+    удаляется из корня, поэтому память не растет с размером файла.
+    """
+    if source is None:
+        source = xml_file_path()
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        # Закончился прямой потомок корня
+        if elem.tag == 'route':
+            yield _route_from_element(elem)
+        root.clear()
+
+
+def _route_from_element(elem):
+    route_data = dict.fromkeys(ROUTE_FIELDS, '')
+    for child in elem:
+        if child.tag in route_data and not route_data[child.tag]:
+            route_data[child.tag] = child.text or ''
+    return route_data
+
+
+def is_complete_route(route_data):
+    """Проверяет что у маршрута заполнены обязательные поля"""
+    return all(route_data[field] for field in REQUIRED_FIELDS)
+
+
+def get_routes_from_xml(path=None):
+    """Получает маршруты из XML файла (с кэшем по версии файла)
+
+    Маршруты читаются из двоичного снимка через mmap, если он есть для
+    текущей версии файла; иначе файл разбирается и снимок записывается для
+    остальных процессов. Возвращается последовательность словарей, общая
+    для всех запросов процесса - не изменяйте её. Если файл не удается
+    разобрать, отдается последняя удачно прочитанная версия.
+    """
+    if path is None:
+        path = xml_file_path()
+    ensure_xml_file_exists(path)
+    try:
+        version = _file_version(path)
+        cached = _routes_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with timed('xml'):
+            routes = _open_snapshot(path, version)
+            if routes is None:
+                # Разобранные маршруты сразу упаковываются в снимок, без списка словарей
+                with SnapshotWriter(ROUTE_FIELDS, directory=os.path.dirname(path)) as writer:
+                    writer.extend(route for route in iter_routes_from_xml(path) if is_complete_route(route))
+                    routes = _write_snapshot(path, writer, version)
+            if routes is None:
+                routes = [route for route in iter_routes_from_xml(path)
+                          if is_complete_route(route)]
+        _routes_cache[path] = (version, routes)
+        return routes
+
+    except (ET.ParseError, FileNotFoundError):
+        cached = _routes_cache.get(path)
+        if cached is not None:
+            return cached[1]
+        ensure_xml_file_exists(path)
+        return []
+
+
+def search_routes_in_xml(query, path=None):
+    """Ищет маршруты XML по подстроке в названии, описании, регионе и сезоне
+
+    Возвращает пару (все маршруты, отсортированные позиции найденных).
+    Триграммный индекс строится один раз на версию файла и дополняется
+    при дозаписи маршрутов.
+    """
+    if path is None:
+        path = xml_file_path()
+    routes = get_routes_from_xml(path)
+    with timed('xml'):
+        return routes, _search_index(path, routes).search(routes, query)
+
+
+def _search_index(path, routes):
+    cached_routes = _routes_cache.get(path)
+    version = cached_routes[0] if cached_routes is not None else None
+    cached_index = _search_index_cache.get(path)
+    if cached_index is not None and cached_index[0] == version and len(cached_index[1]) == len(routes):
+        return cached_index[1]
+    index = TrigramIndex(routes)
+    _search_index_cache[path] = (version, index)
+    return index
+
+
+def preload_xml(path=None):
+    """Загружает маршруты, индекс поиска и ключи дубликатов в кэш процесса
+
+    Возвращает число маршрутов. Используется прогревом перед fork воркеров.
+    """
+    if path is None:
+        path = xml_file_path()
+    routes = get_routes_from_xml(path)
+    _search_index(path, routes)
+    _route_keys(path)
+    return len(routes)
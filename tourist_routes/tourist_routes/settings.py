@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 import sys
+import tempfile
 try:
     # Optional import: if `python-dotenv` isn't installed we should still
     # allow Django to load (e.g., in minimal environments). Wrap import
@@ -58,6 +59,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: замеряет все остальные middleware и представление
+    'routes_app.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,11 +70,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Optional: WhiteNoise serves STATIC_ROOT from the app itself (precompressed
+# .br/.gz variants, immutable cache headers for hashed names) when there is no
+# nginx in front; without it, nginx serves /static/ (see nginx/nginx.conf).
+try:
+    import whitenoise  # type: ignore  # noqa: F401
+except ImportError:
+    whitenoise = None
+if whitenoise is not None and os.getenv('STATIC_WHITENOISE', 'True') == 'True':
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'tourist_routes.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для Server-Timing и /metrics
+        'BACKEND': 'routes_app.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -129,11 +144,22 @@ USE_POSTGRES = os.getenv('USE_POSTGRES', 'False') == 'True'
 # Detect when Django is started via `runserver` so we can avoid attempting
 # to connect to an external Postgres during quick local development runs.
 IS_RUNSERVER = any('runserver' in a for a in sys.argv)
+# `manage.py test`: templates may reference static files that were never
+# collected (see routes_app.storage.CompressedManifestStorage).
+IS_TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
 
 # Only enable PostgreSQL when explicitly requested via USE_POSTGRES or when
 # running in non-debug (production) mode and the config looks valid. This
 # prevents accidental attempts to connect to a malformed Postgres config
 # during local development (`runserver`).
+# Async версии читающих представлений (routes_app/async_views.py); имеет смысл
+# только под ASGI сервером, например gunicorn с воркером uvicorn
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Пул соединений psycopg 3 (DB_POOL=True): соединения делят все потоки воркера
+# вместо отдельного постоянного соединения на поток. Требует psycopg[pool].
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
             'default': {
             'ENGINE': DB_ENGINE,
@@ -142,9 +168,25 @@ DATABASES = {
             'PASSWORD': DB_PASSWORD,
             'HOST': DB_HOST,
             'PORT': DB_PORT,
-            'CONN_MAX_AGE': 600,
-            'ATOMIC_REQUESTS': True,
+            # Под ASGI запросы к БД идут из разных потоков - постоянные
+            # соединения копились бы по одному на поток; с пулом Django
+            # требует CONN_MAX_AGE=0
+            'CONN_MAX_AGE': 0 if ASYNC_VIEWS or DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            # Читающие представления помечены non_atomic_requests
+            'ATOMIC_REQUESTS': os.getenv('DB_ATOMIC_REQUESTS', 'True') == 'True',
+            # За PgBouncer в режиме transaction серверные курсоры не работают
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
         }}
+if DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Сколько секунд ждать свободное соединение
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        },
+    }
 # if (
 #     DB_ENGINE == 'django.db.backends.postgresql'
 #     and _is_valid_postgres_config()
@@ -185,6 +227,35 @@ DATABASES = {
 #     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# LocMemCache is per-process: with several gunicorn workers point CACHE_BACKEND
+# at a shared backend, e.g. django.core.cache.backends.filebased.FileBasedCache
+# (CACHE_LOCATION=/path/to/dir) or django.core.cache.backends.redis.RedisCache
+# (CACHE_LOCATION=redis://127.0.0.1:6379).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'tourist-routes'),
+    }
+}
+
+# With a process-local cache (LocMemCache) the data version that cache keys
+# depend on is kept in this file instead (inode + mtime), so a write handled
+# by one worker invalidates cached pages in all workers of the host.
+DATA_VERSION_FILE = os.getenv('DATA_VERSION_FILE',
+                              os.path.join(tempfile.gettempdir(), 'tourist_routes_data_version'))
+
+
+# Performance metrics
+# Server-Timing header on every response and Prometheus metrics at /metrics/.
+# Every process (gunicorn worker) writes its metrics to a file in METRICS_DIR,
+# /metrics/ sums the files of all processes.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'tourist_routes_metrics'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -224,10 +295,25 @@ STATIC_URL = '/static/'
 # Collected static files (for Docker/Gunicorn). Mapped to a named volume in docker-compose.
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # collectstatic adds content hashes to file names and writes .gz/.br copies
+    # (WhiteNoise's storage when installed, a local equivalent otherwise)
+    'staticfiles': {
+        'BACKEND': 'routes_app.storage.CompressedManifestStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# XML storage of routes; its .snapshot and .lock sidecars live next to it.
+# Read on every call, so tests and benchmarks can point it at a temporary file.
+XML_FILE_PATH = os.getenv('XML_FILE_PATH', os.path.join(MEDIA_ROOT, 'tourist_routes.xml'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 